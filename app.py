@@ -2,8 +2,14 @@ from flask import Flask, render_template, request, jsonify, send_from_directory
 from dotenv import load_dotenv
 import requests
 import time
+import math
 import logging
 import os
+import threading
+import functools
+
+from flask_common import ORJSONProvider, configure_templates
+from playground_stream import sse, sse_response, stream_model_results
 
 # Delay transformers import to avoid Python 3.13 compatibility issues
 # Import will happen lazily when needed
@@ -42,10 +48,15 @@ AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-pre
 AZURE_OPENAI_DEPLOYMENT_GPT4 = os.getenv("AZURE_OPENAI_DEPLOYMENT_1", "gpt-4.1")
 AZURE_OPENAI_DEPLOYMENT_GPT35 = os.getenv("AZURE_OPENAI_DEPLOYMENT_2", "gpt-35-turbo")
 
+# One pooled session for all outbound API calls, so repeat requests to the same
+# host reuse the TCP/TLS connection instead of handshaking every time
+http_session = requests.Session()
+
 # === Initialize Flask ===
 # Configure multiple template folders to support feature-based structure
 import jinja2
 app = Flask(__name__, static_folder="static")
+app.json = ORJSONProvider(app)
 # Setup multiple template loaders for feature-based structure
 feature_loader = jinja2.ChoiceLoader([
     jinja2.FileSystemLoader('.'),
@@ -54,6 +65,7 @@ feature_loader = jinja2.ChoiceLoader([
     jinja2.FileSystemLoader('features/prompt_injection'),
 ])
 app.jinja_loader = feature_loader
+configure_templates(app, precompile=('login_signup.html', 'index.html', 'home.html'))
 
 # === Setup logging ===
 os.makedirs("logs", exist_ok=True)
@@ -86,6 +98,85 @@ model = None
 # This avoids Python 3.13 compatibility issues with torch
 print("⚠️ ML model loading deferred - prompt injection features may be limited")
 
+def _ipex_optimize(eager_model):
+    """BF16-optimize the model with IPEX on CPUs with native BF16; returns (model, uses_bf16)"""
+    try:
+        import intel_extension_for_pytorch as ipex
+    except ImportError:
+        return eager_model, False
+    # Without AVX512-BF16/AMX, bf16 matmuls are emulated and slower than fp32
+    if not torch.ops.mkldnn._is_mkldnn_bf16_supported():
+        return eager_model, False
+    return ipex.optimize(eager_model, dtype=torch.bfloat16, level="O1"), True
+
+def _trace_for_inference(eager_model, eager_tokenizer):
+    """TorchScript-trace and freeze the model for CPU inference; returns the eager model on failure"""
+    example = dict(eager_tokenizer(["example prompt"], return_tensors="pt"))
+    try:
+        with torch.no_grad(), torch.autocast("cpu", dtype=torch.bfloat16, enabled=_detector_bf16):
+            traced = torch.jit.trace(eager_model, example_kwarg_inputs=example, strict=False)
+        return torch.jit.optimize_for_inference(traced)
+    except Exception as e:
+        print(f"⚠️ TorchScript tracing failed, using eager model: {e}")
+        return eager_model
+
+_detector_lock = threading.Lock()
+_detector_load_attempted = False
+_detector_bf16 = False  # Set when IPEX converted the model to bf16; inference then autocasts
+
+def load_detector():
+    """Load the detector on first use; returns True when model and tokenizer are ready"""
+    global tokenizer, model, _detector_load_attempted, _detector_bf16
+    if model is not None or _detector_load_attempted:
+        return model is not None
+    with _detector_lock:
+        if _detector_load_attempted:
+            return model is not None
+        _detector_load_attempted = True
+        if not os.path.isdir(MODEL_DIR) or not _import_transformers():
+            return False
+        try:
+            tokenizer = AutoTokenizer.from_pretrained(MODEL_DIR)
+            # mmap the safetensors weights and build on the meta device, so load
+            # doesn't hold a second full copy of the weights in RAM
+            model = AutoModelForSequenceClassification.from_pretrained(
+                MODEL_DIR,
+                torch_dtype=torch.float32,
+                low_cpu_mem_usage=True,
+                use_safetensors=True,
+            )
+            model.eval()
+            model, _detector_bf16 = _ipex_optimize(model)
+            # Optional: a traced graph skips per-module Python dispatch on every forward
+            if os.getenv("DETECTOR_JIT", "false").lower() == "true":
+                model = _trace_for_inference(model, tokenizer)
+            print(f"✅ Loaded prompt injection model from {MODEL_DIR}")
+        except Exception as e:
+            print(f"⚠️ Could not load model from {MODEL_DIR}: {e}")
+            tokenizer = model = None
+        return model is not None
+
+ML_BATCH_SIZE = 32
+
+def ml_injection_scores(prompts):
+    """Injection probability (0-100) for each prompt, scored in batches of ML_BATCH_SIZE"""
+    scores = []
+    with torch.inference_mode(), torch.autocast("cpu", dtype=torch.bfloat16, enabled=_detector_bf16):
+        for start in range(0, len(prompts), ML_BATCH_SIZE):
+            inputs = tokenizer(
+                prompts[start:start + ML_BATCH_SIZE],
+                return_tensors="pt", truncation=True, padding=True, max_length=256
+            )
+            # ["logits"] works for both the eager ModelOutput and a traced model's dict
+            probs = torch.softmax(model(**inputs)["logits"].float(), dim=-1)
+            scores.extend((probs[:, 1] * 100).tolist())
+    return scores
+
+@functools.lru_cache(maxsize=1024)
+def ml_injection_score(prompt):
+    """Cached single-prompt score; repeated prompts skip tokenization and the forward pass"""
+    return ml_injection_scores([prompt])[0]
+
 
 # === ROUTES ===
 
@@ -129,6 +220,81 @@ def prompt_injection():
 
 
 # === API: AI CHAT (LangChain Orchestration) ===
+def _load_orchestration():
+    """Load langchain-implement/orchestration.py once, so its cached LLM clients survive across requests"""
+    import sys
+    import importlib.util
+    
+    orchestration = sys.modules.get("orchestration")
+    if orchestration is None:
+        # Add the langchain-implement directory to the path
+        langchain_dir = os.path.join(os.path.dirname(__file__), 'langchain-implement')
+        if langchain_dir not in sys.path:
+            sys.path.insert(0, langchain_dir)
+        
+        # Import from the standalone orchestration module (no FastAPI dependencies)
+        spec = importlib.util.spec_from_file_location(
+            "orchestration", 
+            os.path.join(langchain_dir, "orchestration.py")
+        )
+        orchestration = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(orchestration)
+        sys.modules["orchestration"] = orchestration
+        logging.info("✅ Successfully imported LangChain orchestration from orchestration.py")
+    return orchestration
+
+def _request_temperature(data):
+    """Sampling temperature from a chat request body, clamped to [0, 2]; None if it is not a number"""
+    try:
+        temperature = float(data.get("temperature", 0.7))
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(temperature):
+        return None
+    return min(max(temperature, 0.0), 2.0)
+
+def _invalid_temperature():
+    return jsonify({
+        "error": "temperature must be a number",
+        "reply": "Please send a temperature between 0 and 2."
+    }), 400
+
+@app.route('/api/chat/stream', methods=['POST'])
+def ai_chat_stream():
+    """Chat endpoint that streams the three-agent pipeline as server-sent events"""
+    data = request.get_json(silent=True) or {}
+    message = data.get("message", "").strip()
+    if not message:
+        return jsonify({
+            "error": "Message cannot be empty",
+            "reply": "Please enter a message to continue."
+        }), 400
+    # Validate before the 200 headers go out; errors inside generate() can't change the status
+    temperature = _request_temperature(data)
+    if temperature is None:
+        return _invalid_temperature()
+    
+    try:
+        orchestration = _load_orchestration()
+    except Exception as import_error:
+        logging.error(f"❌ Failed to import LangChain orchestration: {import_error}", exc_info=True)
+        return jsonify({
+            "error": "LangChain orchestration unavailable",
+            "reply": "The AI system is not fully configured.",
+            "debug": str(import_error) if app.debug else None
+        }), 503
+    
+    def generate():
+        # stage / token events as they arrive, then done (or error) with the full response
+        events = orchestration.stream_prompt_engineering(
+            message, data.get("session_id"), temperature=temperature
+        )
+        for event in events:
+            kind = event.pop("type")
+            yield sse(event, event=kind if kind != "token" else None)
+    
+    return sse_response(generate())
+
 @app.route('/api/chat', methods=['POST'])
 def ai_chat():
     """New chat endpoint using three-agent orchestration from main_enhanced.py"""
@@ -138,35 +304,21 @@ def ai_chat():
         data = request.get_json()
         message = data.get("message", "").strip()
         session_id = data.get("session_id")
+        # temperature 0 makes the pipeline cacheable on exact repeats
+        temperature = _request_temperature(data)
         
         if not message:
             return jsonify({
                 "error": "Message cannot be empty",
                 "reply": "Please enter a message to continue."
             }), 400
+        if temperature is None:
+            return _invalid_temperature()
         
         # Import and call the LangChain orchestration
         process_prompt_engineering_sync = None
         try:
-            # Use sys.path to import from the langchain-implement directory
-            import sys
-            import importlib.util
-            
-            # Add the langchain-implement directory to the path
-            langchain_dir = os.path.join(os.path.dirname(__file__), 'langchain-implement')
-            if langchain_dir not in sys.path:
-                sys.path.insert(0, langchain_dir)
-            
-            # Import from the standalone orchestration module (no FastAPI dependencies)
-            spec = importlib.util.spec_from_file_location(
-                "orchestration", 
-                os.path.join(langchain_dir, "orchestration.py")
-            )
-            orchestration = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(orchestration)
-            
-            process_prompt_engineering_sync = orchestration.process_prompt_engineering
-            logging.info("✅ Successfully imported LangChain orchestration from orchestration.py")
+            process_prompt_engineering_sync = _load_orchestration().process_prompt_engineering
                 
         except Exception as import_error:
             logging.error(f"❌ Failed to import LangChain orchestration: {import_error}", exc_info=True)
@@ -196,7 +348,7 @@ def ai_chat():
         # Process through three-agent orchestration
         try:
             logging.info(f"Processing message through LangChain 3-agent pipeline: '{message[:50]}...'")
-            result = process_prompt_engineering_sync(message, session_id)
+            result = process_prompt_engineering_sync(message, session_id, temperature=temperature)
             
             logging.info(f"LangChain result status: {result.get('status')}")
             
@@ -258,6 +410,85 @@ def ai_chat():
 
 
 # === API: N8N WEBHOOK PROXY (Legacy) ===
+# n8n webhook URL - UPDATE THIS WITH YOUR CORRECT WEBHOOK URL
+N8N_WEBHOOK_URL = "https://jkathila.app.n8n.cloud/webhook/dd754342-79d4-4d96-9805-1a46e97cbca3"
+
+# Alternative fields an n8n workflow may put its AI reply in, checked in order
+_REPLY_FIELDS = ('output', 'response', 'message', 'text')
+
+def _webhook_ok(response):
+    # Try to parse the response as JSON
+    try:
+        response_data = response.json()
+        print(f"n8n webhook response: {response_data}")
+        
+        # If the response doesn't have a 'reply' field, check for common alternatives
+        if 'reply' not in response_data:
+            field = next((f for f in _REPLY_FIELDS if f in response_data), None)
+            if field:
+                response_data = {"reply": response_data[field]}
+            else:
+                # If we got a JSON response but no recognizable reply field
+                response_data = {
+                    "reply": "✅ n8n workflow is active and responding!",
+                    "raw_response": response_data
+                }
+        
+        return jsonify(response_data)
+        
+    except ValueError as e:
+        # n8n returned 200 but response is not JSON or is empty
+        print(f"n8n response is not valid JSON: {e}")
+        
+        # Check if there's any text response
+        if response.text:
+            return jsonify({
+                "reply": f"✅ n8n workflow responded with: {response.text}",
+                "note": "The n8n workflow is working but not returning JSON. Add a 'Respond to Webhook' node with JSON output."
+            })
+        else:
+            return jsonify({
+                "reply": "✅ n8n workflow is active and processing your request!",
+                "note": "The workflow responded successfully but didn't return any data. To see AI responses, add a 'Respond to Webhook' node in your n8n workflow that returns JSON with a 'reply' field.",
+                "troubleshooting": {
+                    "issue": "n8n workflow returns empty response",
+                    "solution": "Add a 'Respond to Webhook' node at the end of your workflow",
+                    "example_response": {
+                        "reply": "Your AI response here"
+                    }
+                }
+            })
+
+def _webhook_not_found(response):
+    # Specific handling for 404 errors
+    return jsonify({
+        "error": "n8n webhook not found",
+        "reply": "🔧 Configuration Issue: The n8n workflow appears to be inactive or the webhook URL needs to be updated. Please check your n8n workflow status.",
+        "troubleshooting": {
+            "issue": "404 Not Found from n8n webhook",
+            "webhook_url": N8N_WEBHOOK_URL,
+            "steps": [
+                "1. Log into your n8n cloud instance",
+                "2. Check if the workflow is active (not paused)",
+                "3. Verify the webhook URL in your workflow",
+                "4. Update the URL in app.py if changed"
+            ]
+        }
+    }), 200  # Return 200 so the frontend can display the troubleshooting info
+
+def _webhook_error(response):
+    # Handle other non-200 responses
+    return jsonify({
+        "error": f"Webhook returned status {response.status_code}",
+        "reply": f"Sorry, the AI service returned an error (status {response.status_code}). Please try again later."
+    }), 200
+
+# Webhook status code -> response builder; anything unlisted is reported as an error
+_WEBHOOK_HANDLERS = {
+    200: _webhook_ok,
+    404: _webhook_not_found,
+}
+
 @app.route('/api/chat/webhook', methods=['POST'])
 def chat_proxy():
     """Proxy endpoint to forward chat messages to n8n webhook"""
@@ -268,15 +499,12 @@ def chat_proxy():
         if not message.strip():
             return jsonify({"error": "Message cannot be empty"}), 400
         
-        # n8n webhook URL - UPDATE THIS WITH YOUR CORRECT WEBHOOK URL
-        n8n_webhook_url = "https://jkathila.app.n8n.cloud/webhook/dd754342-79d4-4d96-9805-1a46e97cbca3"
-        
-        print(f"Sending message to n8n webhook: {n8n_webhook_url}")
+        print(f"Sending message to n8n webhook: {N8N_WEBHOOK_URL}")
         print(f"Message: {message}")
         
         # Forward request to n8n webhook
-        webhook_response = requests.post(
-            n8n_webhook_url,
+        webhook_response = http_session.post(
+            N8N_WEBHOOK_URL,
             json={"message": message},
             headers={"Content-Type": "application/json"},
             timeout=30  # 30 second timeout
@@ -285,76 +513,7 @@ def chat_proxy():
         print(f"n8n webhook response status: {webhook_response.status_code}")
         print(f"n8n webhook response body: {webhook_response.text[:500]}")  # Log first 500 chars
         
-        if webhook_response.status_code == 200:
-            # Try to parse the response as JSON
-            try:
-                response_data = webhook_response.json()
-                print(f"n8n webhook response: {response_data}")
-                
-                # If the response doesn't have a 'reply' field, check for common alternatives
-                if 'reply' not in response_data:
-                    # Try to find the AI response in different possible fields
-                    if 'output' in response_data:
-                        response_data = {"reply": response_data['output']}
-                    elif 'response' in response_data:
-                        response_data = {"reply": response_data['response']}
-                    elif 'message' in response_data:
-                        response_data = {"reply": response_data['message']}
-                    elif 'text' in response_data:
-                        response_data = {"reply": response_data['text']}
-                    else:
-                        # If we got a JSON response but no recognizable reply field
-                        response_data = {
-                            "reply": "✅ n8n workflow is active and responding!",
-                            "raw_response": response_data
-                        }
-                
-                return jsonify(response_data)
-                
-            except ValueError as e:
-                # n8n returned 200 but response is not JSON or is empty
-                print(f"n8n response is not valid JSON: {e}")
-                
-                # Check if there's any text response
-                if webhook_response.text:
-                    return jsonify({
-                        "reply": f"✅ n8n workflow responded with: {webhook_response.text}",
-                        "note": "The n8n workflow is working but not returning JSON. Add a 'Respond to Webhook' node with JSON output."
-                    })
-                else:
-                    return jsonify({
-                        "reply": "✅ n8n workflow is active and processing your request!",
-                        "note": "The workflow responded successfully but didn't return any data. To see AI responses, add a 'Respond to Webhook' node in your n8n workflow that returns JSON with a 'reply' field.",
-                        "troubleshooting": {
-                            "issue": "n8n workflow returns empty response",
-                            "solution": "Add a 'Respond to Webhook' node at the end of your workflow",
-                            "example_response": {
-                                "reply": "Your AI response here"
-                            }
-                        }
-                    })
-        elif webhook_response.status_code == 404:
-            # Specific handling for 404 errors
-            return jsonify({
-                "error": "n8n webhook not found",
-                "reply": "🔧 Configuration Issue: The n8n workflow appears to be inactive or the webhook URL needs to be updated. Please check your n8n workflow status.",
-                "troubleshooting": {
-                    "issue": "404 Not Found from n8n webhook",
-                    "webhook_url": n8n_webhook_url,
-                    "steps": [
-                        "1. Log into your n8n cloud instance",
-                        "2. Check if the workflow is active (not paused)",
-                        "3. Verify the webhook URL in your workflow",
-                        "4. Update the URL in app.py if changed"
-                    ]
-                }
-            }), 200  # Return 200 so the frontend can display the troubleshooting info
-        else:
-            # Handle other non-200 responses
-            return jsonify({
-                "error": f"Webhook returned status {webhook_response.status_code}",
-                "reply": f"Sorry, the AI service returned an error (status {webhook_response.status_code}). Please try again later."
-            }), 200
+        return _WEBHOOK_HANDLERS.get(webhook_response.status_code, _webhook_error)(webhook_response)
             
     except requests.exceptions.Timeout:
         return jsonify({
@@ -403,13 +562,9 @@ def score_prompt():
     # ============== ML Detection ==============
     ml_score = 0
     label = "Safe"
-    if model and tokenizer:
+    if load_detector():
         try:
-            inputs = tokenizer(prompt, return_tensors="pt", truncation=True, padding=True, max_length=256)
-            with torch.no_grad():
-                outputs = model(**inputs)
-                probs = torch.softmax(outputs.logits, dim=-1)
-                ml_score = probs[0][1].item() * 100
+            ml_score = ml_injection_score(prompt)
             label = "Prompt Injection Detected" if ml_score > 50 else "Safe"
         except Exception as e:
             print(f"Model inference error: {e}")
@@ -460,13 +615,9 @@ def analyze_prompt():
     # ============== ML Detection ==============
     ml_score = 0
     label = "Safe"
-    if model and tokenizer:
+    if load_detector():
         try:
-            inputs = tokenizer(prompt, return_tensors="pt", truncation=True, padding=True, max_length=256)
-            with torch.no_grad():
-                outputs = model(**inputs)
-                probs = torch.softmax(outputs.logits, dim=-1)
-                ml_score = probs[0][1].item() * 100
+            ml_score = ml_injection_score(prompt)
             label = "Prompt Injection Detected" if ml_score > 50 else "Safe"
         except Exception as e:
             print(f"Model inference error: {e}")
@@ -512,7 +663,7 @@ def analyze_prompt():
                 ]
             }
             url = f"{GEMINI_API_URL}?key={GEMINI_API_KEY}"
-            r = requests.post(url, headers=headers, json=body, timeout=15)
+            r = http_session.post(url, headers=headers, json=body, timeout=15)
             r.raise_for_status()
             data = r.json()
             explanation = (
@@ -555,7 +706,7 @@ def explain():
     }
     try:
         url = f"{GEMINI_API_URL}?key={GEMINI_API_KEY}"
-        r = requests.post(url, headers=headers, json=body, timeout=15)
+        r = http_session.post(url, headers=headers, json=body, timeout=15)
         r.raise_for_status()
         data = r.json()
         explanation = (
@@ -582,13 +733,9 @@ def detector_score():
     # ML detection (reuse model/tokenizer if available)
     ml_score = 0
     label = 'Safe'
-    if model and tokenizer:
+    if load_detector():
         try:
-            inputs = tokenizer(prompt, return_tensors='pt', truncation=True, padding=True, max_length=256)
-            with torch.no_grad():
-                outputs = model(**inputs)
-                probs = torch.softmax(outputs.logits, dim=-1)
-                ml_score = float(probs[0][1].item() * 100)
+            ml_score = ml_injection_score(prompt)
             label = 'Prompt Injection Detected' if ml_score > 50 else 'Safe'
         except Exception as e:
             print('Model inference error in detector_score:', e)
@@ -647,7 +794,7 @@ def detector_explain():
     }
     try:
         url = f"{GEMINI_API_URL}?key={GEMINI_API_KEY}"
-        r = requests.post(url, headers=headers, json=body, timeout=15)
+        r = http_session.post(url, headers=headers, json=body, timeout=15)
         r.raise_for_status()
         resp = r.json()
         explanation = (
@@ -680,7 +827,7 @@ def gemini_chat():
     }
     try:
         url = f"{GEMINI_API_URL}?key={GEMINI_API_KEY}"
-        r = requests.post(url, headers=headers, json=body, timeout=20)
+        r = http_session.post(url, headers=headers, json=body, timeout=20)
         r.raise_for_status()
         resp = r.json()
         reply = (
@@ -724,39 +871,7 @@ def run_prompt():
         if not models or len(models) == 0:
             return jsonify({'error': 'At least one model must be selected'}), 400
         
-        results = []
-        
-        # Process each model
-        for model_id in models:
-            model_start = time.time()
-            
-            try:
-                if model_id == 'gemini-2.0-flash-exp':
-                    result = call_gemini_model(system_instruction, prompt)
-                elif model_id in ['gpt-4-turbo', 'gpt-3.5-turbo']:
-                    result = call_openai_model(model_id, system_instruction, prompt)
-                elif model_id == 'claude-3-opus':
-                    result = call_claude_model(system_instruction, prompt)
-                else:
-                    result = {
-                        'model': model_id,
-                        'response': f'Model {model_id} is not yet implemented.',
-                        'status': 'Not Implemented',
-                        'metadata': {'latency': 0, 'tokens': 0, 'cost_estimate': 0}
-                    }
-                
-                # Add timing
-                result['metadata']['latency'] = time.time() - model_start
-                results.append(result)
-                
-            except Exception as e:
-                logging.error(f"Error calling {model_id}: {e}")
-                results.append({
-                    'model': model_id,
-                    'response': f'Error: {str(e)}',
-                    'status': 'Error',
-                    'metadata': {'latency': time.time() - model_start, 'tokens': 0, 'cost_estimate': 0}
-                })
+        results = [_run_playground_model(model_id, system_instruction, prompt) for model_id in models]
         
         total_time = time.time() - start_time
         logging.info(f"✅ Playground request completed - {len(results)} models, {total_time:.2f}s total")
@@ -771,6 +886,64 @@ def run_prompt():
         return jsonify({'error': str(e)}), 500
 
 
+def _run_playground_model(model_id, system_instruction, prompt):
+    """One model's normalized playground result, with latency; errors become an Error result"""
+    model_start = time.time()
+    
+    try:
+        if model_id == 'gemini-2.0-flash-exp':
+            result = call_gemini_model(system_instruction, prompt)
+        elif model_id in ['gpt-4-turbo', 'gpt-3.5-turbo']:
+            result = call_openai_model(model_id, system_instruction, prompt)
+        elif model_id == 'claude-3-opus':
+            result = call_claude_model(system_instruction, prompt)
+        else:
+            result = {
+                'model': model_id,
+                'response': f'Model {model_id} is not yet implemented.',
+                'status': 'Not Implemented',
+                'metadata': {'latency': 0, 'tokens': 0, 'cost_estimate': 0}
+            }
+        
+        # Add timing
+        result['metadata']['latency'] = time.time() - model_start
+        return result
+        
+    except Exception as e:
+        return _playground_error(model_id, e, time.time() - model_start)
+
+
+def _playground_error(model_id, error, latency=0):
+    logging.error(f"Error calling {model_id}: {error}")
+    return {
+        'model': model_id,
+        'response': f'Error: {str(error)}',
+        'status': 'Error',
+        'metadata': {'latency': latency, 'tokens': 0, 'cost_estimate': 0}
+    }
+
+
+@app.route('/api/playground/run_prompt_stream', methods=['GET', 'POST'])
+def run_prompt_stream():
+    """Playground endpoint that sends each model's result as a server-sent event as soon as it is ready"""
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        models = data.get('models', [])
+    else:  # EventSource can only GET, so accept the same fields as query params
+        data = request.args
+        models = request.args.getlist('models')
+    system_instruction = data.get('system_instruction', '').strip()
+    prompt = data.get('prompt', '').strip()
+    
+    if not prompt:
+        return jsonify({'error': 'Prompt is required'}), 400
+    
+    if not models:
+        return jsonify({'error': 'At least one model must be selected'}), 400
+    
+    return stream_model_results(_run_playground_model, _playground_error, models, system_instruction, prompt)
+
+
 @app.route('/api/playground/analyze_results', methods=['POST'])
 def analyze_results():
     """
@@ -799,7 +972,7 @@ def analyze_results():
         }
         
         url = f"{GEMINI_API_URL}?key={GEMINI_API_KEY}"
-        r = requests.post(url, headers=headers, json=body, timeout=30)
+        r = http_session.post(url, headers=headers, json=body, timeout=30)
         r.raise_for_status()
         resp = r.json()
         
@@ -838,7 +1011,7 @@ def call_gemini_model(system_instruction, prompt):
     }
     
     url = f"{GEMINI_API_URL}?key={GEMINI_API_KEY}"
-    r = requests.post(url, headers=headers, json=body, timeout=30)
+    r = http_session.post(url, headers=headers, json=body, timeout=30)
     r.raise_for_status()
     resp = r.json()
     
@@ -902,7 +1075,7 @@ def call_openai_model(model_id, system_instruction, prompt):
     }
     
     try:
-        r = requests.post(url, headers=headers, json=body, timeout=30)
+        r = http_session.post(url, headers=headers, json=body, timeout=30)
         r.raise_for_status()
         resp = r.json()
         
@@ -104,11 +104,12 @@ async function handleAnalyze() {
     `;
 
     try {
-        // Call API to run prompt across models
-        const response = await fetch('/api/playground/run_prompt', {
+        // Stream results as server-sent events so each model shows up as soon as it answers
+        const response = await fetch('/api/playground/run_prompt_stream', {
             method: 'POST',
             headers: {
-                'Content-Type': 'application/json'
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream'
             },
             body: JSON.stringify({
                 system_instruction: systemInstruction,
@@ -121,14 +122,17 @@ async function handleAnalyze() {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
 
-        const data = await response.json();
-        currentResults = data.results;
-
-        // Display results
-        displayResults(data.results, userPrompt);
+        const results = [];
+        await readEventStream(response, (event, data) => {
+            if (event === 'message') {
+                results.push(data);
+                displayResults(results, userPrompt);
+            }
+        });
+        currentResults = results;
 
         // Get meta-analysis
-        await getMetaAnalysis(data.results, userPrompt);
+        await getMetaAnalysis(results, userPrompt);
 
         // Save state
         saveState();
@@ -151,6 +155,33 @@ async function handleAnalyze() {
     }
 }
 
+// Parse a text/event-stream response body, calling onEvent(event, data) per frame
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const frame = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            const dataLines = [];
+            frame.split('\n').forEach(line => {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim());
+            });
+            if (dataLines.length) onEvent(event, JSON.parse(dataLines.join('\n')));
+        }
+    }
+}
+
 // Display results
 function displayResults(results, originalPrompt) {
     clearButton.classList.remove('hidden');
@@ -0,0 +1,33 @@
+"""
+Flask setup shared by app.py and simple_app.py
+"""
+
+import os
+
+import jinja2
+import orjson
+from flask.json.provider import JSONProvider
+
+# One on-disk bytecode cache next to this file, so both apps (and all their
+# worker processes) reuse each other's compiled templates whatever the cwd
+JINJA_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.jinja_cache')
+
+class ORJSONProvider(JSONProvider):
+    """Flask JSON provider backed by orjson, shared by both apps"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS, default=str).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+def configure_templates(app, precompile=()):
+    """Attach the shared bytecode cache to app's Jinja environment and compile precompile up front"""
+    os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+    app.jinja_env.bytecode_cache = jinja2.FileSystemBytecodeCache(JINJA_CACHE_DIR)
+    # Compile the page templates now so the first request doesn't pay for it
+    for template in precompile:
+        try:
+            app.jinja_env.get_template(template)
+        except jinja2.TemplateError as e:
+            print(f"⚠️ Could not precompile template {template}: {e}")
@@ -5,212 +5,717 @@ No FastAPI dependencies - pure Python with LangChain only
 
 import os
 import time
+import asyncio
 import logging
-from datetime import datetime
-from typing import Dict, Any
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from time import perf_counter_ns
+from typing import Any, AsyncIterator, Dict, List, Optional
 from uuid import uuid4
 
+import jinja2
+import numpy as np
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings, ChatOpenAI, OpenAIEmbeddings
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+from pydantic import BaseModel, Field
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# "staged" runs the three agents as separate calls; "single" asks one call to
+# play all three roles and return their outputs as structured fields;
+# "structured" has the Guardrail Engineer return template fields that the
+# Polisher renders locally instead of making its own call
+ORCHESTRATION_MODE = os.getenv("ORCHESTRATION_MODE", "staged")
+
+# Semantic cache: reuse the final template of a near-duplicate earlier request
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1024"))
+
+# Architect and Guardrail are structural rewrites that a small fast model handles;
+# the Polisher (and the single-call mode) use the larger one. Unset = default deployment.
+AZURE_OPENAI_DEPLOYMENT_FAST = os.getenv("AZURE_OPENAI_DEPLOYMENT_FAST")
+AZURE_OPENAI_DEPLOYMENT_SMART = os.getenv("AZURE_OPENAI_DEPLOYMENT_SMART")
+
+# Exact-match cache of whole pipeline results, used only for temperature=0 requests
+EXACT_CACHE_MAX_ENTRIES = int(os.getenv("EXACT_CACHE_MAX_ENTRIES", "256"))
+AGENT_MAX_TOKENS = 2000
+
+_exact_cache = OrderedDict()
+
+_loop = None
+_loop_lock = threading.Lock()
+
+class PipelineResult(BaseModel):
+    """Structured output of the single-call pipeline, one field per agent role"""
+    architect: str = Field(description="Prompt Architect's initial prompt template")
+    guardrail: str = Field(description="Guardrail Engineer's safety-enhanced template")
+    final: str = Field(description="Template Polisher's final production-ready template")
+
+class PromptTemplateOut(BaseModel):
+    """Structured prompt template returned by the Guardrail Engineer in structured mode"""
+    role: str = Field(description="Role definition for the assistant")
+    instructions: List[str] = Field(description="Specific instructions, one per item")
+    output_format: str = Field(description="Expected output format")
+    constraints: List[str] = Field(description="Constraints, safety guardrails and edge-case handling, one per item")
+    examples: str = Field(default="", description="Example interactions, if applicable")
+    usage_notes: str = Field(description="Usage instructions and best practices for the template")
+
+PROMPT_TEMPLATE_RENDER = jinja2.Template("""# Role
+{{ role }}
+
+## Instructions
+{% for item in instructions %}
+{{ loop.index }}. {{ item }}
+{% endfor %}
+
+## Output Format
+{{ output_format }}
+
+## Constraints
+{% for item in constraints %}
+- {{ item }}
+{% endfor %}
+{% if examples %}
+
+## Examples
+{{ examples }}
+{% endif %}
+
+## Usage Instructions & Best Practices
+{{ usage_notes }}
+""", trim_blocks=True, lstrip_blocks=True)
+
+# Agent instructions are static system messages and the request or draft goes in
+# the trailing user message, so every call shares a byte-identical prefix that
+# the provider's automatic prompt caching can reuse. Keep ids/timestamps out.
+SINGLE_CALL_SYSTEM = """You are a prompt engineering pipeline made of three roles. Perform each role in order, each building on the previous one, and return all three results.
+
+1. PROMPT ARCHITECT (field "architect"): Transform the user's request into a well-structured prompt template with a clear role definition, specific instructions, expected output format, context and constraints, and example interactions (if applicable). Focus on clarity, specificity, and professional tone.
+
+2. GUARDRAIL ENGINEER (field "guardrail"): Enhance the architect's template with safety guardrails and ethical boundaries, handling for edge cases and errors, quality checks and validation steps, protection against harmful or inappropriate outputs, and robustness against prompt injection attacks, while maintaining its core functionality.
+
+3. TEMPLATE POLISHER (field "final"): Optimize the guardrail template for clarity and conciseness, ensure consistent formatting and structure, add professional polish, and include usage instructions and best practices. Deliver a polished, production-ready prompt template that meets MAANG engineering standards."""
+
+ARCHITECT_SYSTEM = """You are a Prompt Architect specializing in creating high-quality system prompts.
+
+Your task: Transform the user's request into a well-structured prompt template.
+
+Create a comprehensive prompt template that includes:
+1. Clear role definition
+2. Specific instructions 
+3. Expected output format
+4. Context and constraints
+5. Example interactions (if applicable)
+
+Focus on clarity, specificity, and professional tone. This will be refined by subsequent agents."""
+
+GUARDRAIL_SYSTEM = """You are a Guardrail Engineer responsible for prompt safety and quality assurance.
+
+Review the prompt template created by the Prompt Architect.
+
+Your tasks:
+1. Add safety guardrails and ethical boundaries
+2. Include handling for edge cases and errors
+3. Add quality checks and validation steps
+4. Ensure prompt prevents harmful or inappropriate outputs
+5. Add robustness against prompt injection attacks
+
+Enhance the template while maintaining its core functionality."""
+
+STRUCTURED_GUARDRAIL_SYSTEM = GUARDRAIL_SYSTEM + """
+
+Return the enhanced template as structured fields, including usage instructions and best practices for it."""
+
+POLISHER_SYSTEM = """You are a Template Polisher specializing in final optimization of prompt templates.
+
+Take the prompt template draft created by the Prompt Architect. A Guardrail Engineer is adding the safety rules separately; do not rewrite the template itself. Your tasks:
+1. Write clear usage instructions for the template
+2. List best practices for getting reliable results from it
+3. Give a short formatting guide for its inputs and expected outputs
+
+Respond with only the "Usage Instructions & Best Practices" section, meeting MAANG engineering standards."""
+
+DRAFT_MESSAGE = "Prompt template created by the Prompt Architect:\n\n{architect_result}"
+
+# Built once at import; each request only fills in the placeholders
+SINGLE_CALL_TMPL = ChatPromptTemplate.from_messages([("system", SINGLE_CALL_SYSTEM), ("human", "User Request: {message}")])
+ARCHITECT_TMPL = ChatPromptTemplate.from_messages([("system", ARCHITECT_SYSTEM), ("human", "User Request: {message}")])
+GUARDRAIL_TMPL = ChatPromptTemplate.from_messages([("system", GUARDRAIL_SYSTEM), ("human", DRAFT_MESSAGE)])
+STRUCTURED_GUARDRAIL_TMPL = ChatPromptTemplate.from_messages([("system", STRUCTURED_GUARDRAIL_SYSTEM), ("human", DRAFT_MESSAGE)])
+POLISHER_TMPL = ChatPromptTemplate.from_messages([("system", POLISHER_SYSTEM), ("human", DRAFT_MESSAGE)])
+
 def create_llm(model_config: Dict[str, Any] = None):
     """Create LLM instance - Azure OpenAI or standard OpenAI"""
     config = model_config or {}
-    
-    # Check for Azure OpenAI configuration
     azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
     azure_key = os.getenv("AZURE_OPENAI_API_KEY") or os.getenv("OPENAI_API_KEY")
     
+    # Check for Azure OpenAI configuration
     if azure_endpoint and azure_key:
-        from langchain_openai import AzureChatOpenAI
+        deployment = config.get('deployment', os.getenv("AZURE_OPENAI_DEPLOYMENT_1", "gpt-4"))
+    else:
+        azure_endpoint = None
+        deployment = config.get('deployment', 'gpt-4o-mini')
+    temperature = _quantize_temperature(config.get('temperature', 0.7))
+    return _build_llm((deployment, temperature, config.get('max_tokens', 2000), azure_endpoint))
+
+
+def _quantize_temperature(temperature) -> float:
+    """Clamp to the API's [0, 2] range and round to 0.1 so _build_llm sees few distinct keys"""
+    return round(min(max(float(temperature), 0.0), 2.0), 1)
+
+
+@lru_cache(maxsize=8)
+def _build_llm(cfg_key: tuple):
+    """Build one client per (deployment, temperature, max_tokens, endpoint) and reuse its connection pool"""
+    deployment, temperature, max_tokens, azure_endpoint = cfg_key
+    if azure_endpoint:
         return AzureChatOpenAI(
             azure_endpoint=azure_endpoint,
-            api_key=azure_key,
-            azure_deployment=config.get('deployment', os.getenv("AZURE_OPENAI_DEPLOYMENT_1", "gpt-4")),
+            api_key=os.getenv("AZURE_OPENAI_API_KEY") or os.getenv("OPENAI_API_KEY"),
+            azure_deployment=deployment,
             api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview"),
-            temperature=config.get('temperature', 0.7),
-            max_tokens=config.get('max_tokens', 2000),
+            temperature=temperature,
+            max_tokens=max_tokens,
             timeout=30,
-            max_retries=3
+            max_retries=0  # retried with backoff in _invoke_with_retry
         )
-    else:
-        # Fallback to standard OpenAI
-        from langchain_openai import ChatOpenAI
-        openai_key = os.getenv("OPENAI_API_KEY")
-        return ChatOpenAI(
-            api_key=openai_key,
-            model=config.get('deployment', 'gpt-4o-mini'),
-            temperature=config.get('temperature', 0.7),
-            max_tokens=config.get('max_tokens', 2000),
-            timeout=30,
-            max_retries=3
+    # Fallback to standard OpenAI
+    return ChatOpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        model=deployment,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        timeout=30,
+        max_retries=0  # retried with backoff in _invoke_with_retry
+    )
+
+
+def _stage_llms(temperature: float = 0.7) -> Dict[str, Any]:
+    """Per-agent LLM clients, keyed by stage"""
+    config = {'temperature': temperature, 'max_tokens': AGENT_MAX_TOKENS}
+    fast = create_llm({**config, 'deployment': AZURE_OPENAI_DEPLOYMENT_FAST} if AZURE_OPENAI_DEPLOYMENT_FAST else config)
+    smart = create_llm({**config, 'deployment': AZURE_OPENAI_DEPLOYMENT_SMART} if AZURE_OPENAI_DEPLOYMENT_SMART else config)
+    return {"architect": fast, "guardrail": fast, "polisher": smart}
+
+
+@lru_cache(maxsize=1)
+def _build_embedder():
+    """Build the embeddings client used to key the semantic cache"""
+    azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
+    azure_key = os.getenv("AZURE_OPENAI_API_KEY") or os.getenv("OPENAI_API_KEY")
+    if azure_endpoint and azure_key:
+        return AzureOpenAIEmbeddings(
+            azure_endpoint=azure_endpoint,
+            api_key=azure_key,
+            azure_deployment=os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT", "text-embedding-3-small"),
+            api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
         )
+    return OpenAIEmbeddings(api_key=os.getenv("OPENAI_API_KEY"), model="text-embedding-3-small")
+
+
+class SemanticCache:
+    """In-memory cosine-similarity cache of final templates keyed by request embeddings"""
+    
+    def __init__(self, threshold: float, max_entries: int):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        # Ring buffer: rows are allocated once (on the first put, when the width is known)
+        # and overwritten in place at _next once all max_entries are used
+        self._vectors = None
+        self._results = [None] * max_entries
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+    
+    def get(self, vector: np.ndarray):
+        """Return the cached result of the most similar request, or None below the threshold"""
+        with self._lock:
+            if not self._size:
+                return None
+            # Rows past _size have never been written
+            scores = self._vectors[:self._size] @ vector
+            best = int(scores.argmax())
+            return self._results[best] if scores[best] >= self.threshold else None
+    
+    def put(self, vector: np.ndarray, result: str):
+        """Store a result, overwriting the oldest entry once the cache is full"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.empty((self.max_entries, vector.shape[0]), dtype=np.float32)
+            self._vectors[self._next] = vector
+            self._results[self._next] = result
+            self._next = (self._next + 1) % self.max_entries
+            self._size = min(self._size + 1, self.max_entries)
+
+
+_semantic_cache = SemanticCache(SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_MAX_ENTRIES)
+
+
+async def _embed(message: str):
+    """Unit-normalised embedding of the message, or None if the embeddings call fails"""
+    try:
+        vector = np.asarray(await _build_embedder().aembed_query(message), dtype=np.float32)
+    except Exception as e:
+        logger.warning("Semantic cache lookup skipped: %s", e)
+        return None
+    return vector / (np.linalg.norm(vector) or 1.0)
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """One long-lived loop for the sync wrapper, so cached clients keep their async connection pools"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="orchestration-loop", daemon=True).start()
+    return _loop
+
+
+def process_prompt_engineering(message: str, session_id: str = None, use_semantic_cache: bool = None,
+                               temperature: float = 0.7) -> Dict[str, Any]:
+    """Synchronous wrapper around process_prompt_engineering_async for the Flask caller"""
+    future = asyncio.run_coroutine_threadsafe(
+        process_prompt_engineering_async(message, session_id, use_semantic_cache, temperature), _background_loop()
+    )
+    return future.result()
 
 
-def process_prompt_engineering(message: str, session_id: str = None) -> Dict[str, Any]:
+async def process_prompt_engineering_async(message: str, session_id: str = None, use_semantic_cache: bool = None,
+                                           temperature: float = 0.7) -> Dict[str, Any]:
     """
     Three-agent orchestration for MAANG-grade prompt engineering.
     
     Agent 1 (Prompt Architect): Creates initial prompt structure
     Agent 2 (Guardrail Engineer): Adds safety and quality checks  
-    Agent 3 (Template Polisher): Final optimization and formatting
+    Agent 3 (Template Polisher): Usage instructions and formatting guide
+    
+    Agents 2 and 3 both work from the Architect's draft, so they run concurrently.
     
     Args:
         message: The user's draft prompt request
         session_id: Optional session ID for conversation tracking
+        use_semantic_cache: Reuse results of near-duplicate requests (defaults to SEMANTIC_CACHE_ENABLED)
+        temperature: Sampling temperature for every agent; 0 also enables the exact-match result cache
     
     Returns:
         Dict with structured response including final_output and execution_history
     """
-    start_time = time.time()
+    start_ns = perf_counter_ns()
     session_id = session_id or str(uuid4())
-    workflow_id = f"prompt_eng_{int(start_time)}"
+    workflow_id = f"prompt_eng_{int(time.time())}"
+    execution_history = []
     
     try:
-        # Create the LLM instance
-        llm = create_llm({
-            'temperature': 0.7,
-            'max_tokens': 2000
-        })
+        temperature = _quantize_temperature(temperature)
+        # Create the per-agent LLM instances
+        llms = _stage_llms(temperature)
         
-        execution_history = []
+        exact_key = _exact_cache_key(message, temperature)
+        final_result, cache_vector = _lookup_exact_cache(exact_key, execution_history), None
+        if final_result is None:
+            final_result, cache_vector = await _lookup_semantic_cache(message, use_semantic_cache, execution_history)
+            if final_result is None:
+                final_result = await _PIPELINES.get(ORCHESTRATION_MODE, _run_staged)(llms, message, execution_history)
+                if cache_vector is not None:
+                    _semantic_cache.put(cache_vector, final_result)
+            _store_exact_cache(exact_key, final_result, execution_history)
         
-        # ==================== AGENT 1: PROMPT ARCHITECT ====================
-        architect_prompt = f"""You are a Prompt Architect specializing in creating high-quality system prompts.
-
-Your task: Transform the user's request into a well-structured prompt template.
-
-User Request: {message}
-
-Create a comprehensive prompt template that includes:
-1. Clear role definition
-2. Specific instructions 
-3. Expected output format
-4. Context and constraints
-5. Example interactions (if applicable)
+        return _completed_response(workflow_id, session_id, message, final_result, execution_history, start_ns)
+        
+    except Exception as e:
+        return _error_response(workflow_id, session_id, message, e, execution_history, start_ns)
 
-Focus on clarity, specificity, and professional tone. This will be refined by subsequent agents."""
 
-        logger.info("Agent 1 (Prompt Architect) - Starting...")
-        architect_start = time.time()
-        architect_response = llm.invoke(architect_prompt)
-        architect_result = architect_response.content
-        architect_time = (time.time() - architect_start) * 1000
+async def process_prompt_engineering_stream(message: str, session_id: str = None, use_semantic_cache: bool = None,
+                                            temperature: float = 0.7) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming variant of process_prompt_engineering_async.
+    
+    Yields {"type": "stage", ...} with each agent's execution_history entry as it finishes,
+    {"type": "token", "content": ...} chunks of the final template while the Guardrail
+    Engineer generates it, and finally {"type": "done" | "error", "response": {...}} with
+    the same dict process_prompt_engineering_async returns.
+    """
+    start_ns = perf_counter_ns()
+    session_id = session_id or str(uuid4())
+    workflow_id = f"prompt_eng_{int(time.time())}"
+    execution_history = []
+    
+    try:
+        temperature = _quantize_temperature(temperature)
+        llms = _stage_llms(temperature)
         
-        execution_history.append({
-            "agent": "Prompt Architect",
-            "execution_time_ms": architect_time,
-            "input_preview": message[:100] + "..." if len(message) > 100 else message,
-            "output_preview": architect_result[:200] + "..." if len(architect_result) > 200 else architect_result,
-            "status": "completed"
-        })
-        logger.info(f"Agent 1 completed in {architect_time:.2f}ms")
+        exact_key = _exact_cache_key(message, temperature)
+        final_result, cache_vector = _lookup_exact_cache(exact_key, execution_history), None
+        if final_result is None:
+            final_result, cache_vector = await _lookup_semantic_cache(message, use_semantic_cache, execution_history)
+        else:
+            exact_key = None  # already cached
         
-        # ==================== AGENT 2: GUARDRAIL ENGINEER ====================
-        guardrail_prompt = f"""You are a Guardrail Engineer responsible for prompt safety and quality assurance.
+        pipeline = _PIPELINES.get(ORCHESTRATION_MODE, _run_staged)
+        if final_result is not None or pipeline is not _run_staged:
+            # Cached and structured-output results arrive whole
+            if final_result is None:
+                final_result = await pipeline(llms, message, execution_history)
+            for entry in execution_history:
+                yield {"type": "stage", **entry}
+            yield {"type": "token", "content": final_result}
+        else:
+            parts = []
+            async for event in _stream_staged(llms, message, execution_history):
+                if event["type"] == "token":
+                    parts.append(event["content"])
+                yield event
+            final_result = "".join(parts)
+        
+        if cache_vector is not None and execution_history[0]["status"] != "cached":
+            _semantic_cache.put(cache_vector, final_result)
+        _store_exact_cache(exact_key, final_result, execution_history)
+        
+        yield {"type": "done", "response": _completed_response(
+            workflow_id, session_id, message, final_result, execution_history, start_ns
+        )}
+        
+    except Exception as e:
+        yield {"type": "error", "response": _error_response(
+            workflow_id, session_id, message, e, execution_history, start_ns
+        )}
 
-Review this prompt template created by the Prompt Architect:
 
-{architect_result}
+def stream_prompt_engineering(message: str, session_id: str = None, use_semantic_cache: bool = None,
+                              temperature: float = 0.7):
+    """Synchronous iterator over process_prompt_engineering_stream events for the Flask caller"""
+    loop = _background_loop()
+    events = process_prompt_engineering_stream(message, session_id, use_semantic_cache, temperature)
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(events.__anext__(), loop).result()
+            except StopAsyncIteration:
+                return
+    finally:
+        # Client went away mid-stream; close the generator on its own loop
+        asyncio.run_coroutine_threadsafe(events.aclose(), loop).result()
 
-Your tasks:
-1. Add safety guardrails and ethical boundaries
-2. Include handling for edge cases and errors
-3. Add quality checks and validation steps
-4. Ensure prompt prevents harmful or inappropriate outputs
-5. Add robustness against prompt injection attacks
 
-Enhance the template while maintaining its core functionality."""
+def _exact_cache_key(message: str, temperature: float):
+    """Exact-match cache key, or None when sampling makes the pipeline non-deterministic"""
+    if temperature != 0:
+        return None
+    return (message, temperature, AGENT_MAX_TOKENS, AZURE_OPENAI_DEPLOYMENT_FAST, AZURE_OPENAI_DEPLOYMENT_SMART,
+            ORCHESTRATION_MODE)
 
-        logger.info("Agent 2 (Guardrail Engineer) - Starting...")
-        guardrail_start = time.time()
-        guardrail_response = llm.invoke(guardrail_prompt)
-        guardrail_result = guardrail_response.content
-        guardrail_time = (time.time() - guardrail_start) * 1000
-        
-        execution_history.append({
-            "agent": "Guardrail Engineer", 
-            "execution_time_ms": guardrail_time,
-            "input_preview": "Enhanced prompt from Architect",
-            "output_preview": guardrail_result[:200] + "..." if len(guardrail_result) > 200 else guardrail_result,
-            "status": "completed"
-        })
-        logger.info(f"Agent 2 completed in {guardrail_time:.2f}ms")
-        
-        # ==================== AGENT 3: TEMPLATE POLISHER ====================
-        polisher_prompt = f"""You are a Template Polisher specializing in final optimization of prompt templates.
 
-Take this safety-enhanced prompt template:
+def _lookup_exact_cache(key, execution_history: list):
+    """Cached final template for key (restoring its execution_history), or None"""
+    cached = _exact_cache.get(key) if key is not None else None
+    if cached is None:
+        return None
+    _exact_cache.move_to_end(key)
+    final_result, history = cached
+    execution_history.extend(dict(entry) for entry in history)
+    return final_result
 
-{guardrail_result}
 
-Your final tasks:
-1. Optimize for clarity and conciseness
-2. Ensure consistent formatting and structure
-3. Add professional polish and refinement
-4. Create the final production-ready template
-5. Include usage instructions and best practices
+def _store_exact_cache(key, final_result: str, execution_history: list):
+    """Remember a finished pipeline result under key, evicting the least recently used"""
+    if key is None:
+        return
+    _exact_cache[key] = (final_result, tuple(dict(entry) for entry in execution_history))
+    _exact_cache.move_to_end(key)
+    while len(_exact_cache) > EXACT_CACHE_MAX_ENTRIES:
+        _exact_cache.popitem(last=False)
 
-Deliver a polished, production-ready prompt template that meets MAANG engineering standards."""
 
-        logger.info("Agent 3 (Template Polisher) - Starting...")
-        polisher_start = time.time()
-        polisher_response = llm.invoke(polisher_prompt)
-        final_result = polisher_response.content
-        polisher_time = (time.time() - polisher_start) * 1000
-        
+async def _lookup_semantic_cache(message: str, use_semantic_cache: bool, execution_history: list) -> tuple:
+    """Return (cached final template or None, message embedding or None when the cache is off)"""
+    if not (SEMANTIC_CACHE_ENABLED if use_semantic_cache is None else use_semantic_cache):
+        return None, None
+    
+    lookup_start = perf_counter_ns()
+    cache_vector = await _embed(message)
+    final_result = _semantic_cache.get(cache_vector) if cache_vector is not None else None
+    if final_result is not None:
         execution_history.append({
-            "agent": "Template Polisher",
-            "execution_time_ms": polisher_time, 
-            "input_preview": "Safety-enhanced prompt from Guardrail Engineer",
-            "output_preview": final_result[:200] + "..." if len(final_result) > 200 else final_result,
-            "status": "completed"
+            "agent": "Semantic Cache",
+            "execution_time_ms": (perf_counter_ns() - lookup_start) / 1e6,
+            "input_preview": _preview(message, 100),
+            "status": "cached"
         })
-        logger.info(f"Agent 3 completed in {polisher_time:.2f}ms")
-        
-        total_time = (time.time() - start_time) * 1000
-        logger.info(f"✅ 3-Agent pipeline completed successfully in {total_time:.2f}ms")
-        
-        return {
-            "workflow_id": workflow_id,
-            "session_id": session_id,
-            "status": "completed",
-            "immediate_response": "✅ 3-Agent Pipeline Completed Successfully",
-            "final_output": {
-                "final_prompt_template": final_result,
-                "agent_pipeline": [
-                    {"agent": "Prompt Architect", "contribution": "Initial structure and clarity"},
-                    {"agent": "Guardrail Engineer", "contribution": "Safety and robustness"},
-                    {"agent": "Template Polisher", "contribution": "Final optimization"}
-                ],
-                "metadata": {
-                    "original_request": message,
-                    "processing_pipeline": "3-Agent MAANG-Grade",
-                    "quality_standard": "Production Ready"
-                }
-            },
-            "execution_history": execution_history,
-            "total_execution_time_ms": total_time,
-            "timestamp": datetime.utcnow().isoformat()
-        }
-        
-    except Exception as e:
-        logger.error(f"❌ 3-Agent pipeline failed: {str(e)}", exc_info=True)
-        
-        # Return error response in same format
-        return {
-            "workflow_id": workflow_id,
-            "session_id": session_id,
-            "status": "error", 
-            "immediate_response": f"❌ Pipeline Error: {str(e)}",
-            "final_output": {
-                "error": str(e),
-                "error_type": type(e).__name__,
+    return final_result, cache_vector
+
+
+def _utc_timestamp() -> str:
+    """Current UTC time as an ISO 8601 string, to the second"""
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+def _completed_response(workflow_id: str, session_id: str, message: str, final_result: str,
+                        execution_history: list, start_ns: int) -> Dict[str, Any]:
+    """Build the response dict returned to the Flask caller for a finished pipeline"""
+    total_time = (perf_counter_ns() - start_ns) / 1e6
+    logger.info("✅ 3-Agent pipeline completed successfully in %.2fms", total_time)
+    
+    return {
+        "workflow_id": workflow_id,
+        "session_id": session_id,
+        "status": "completed",
+        "immediate_response": "✅ 3-Agent Pipeline Completed Successfully",
+        "final_output": {
+            "final_prompt_template": final_result,
+            "agent_pipeline": [
+                {"agent": "Prompt Architect", "contribution": "Initial structure and clarity"},
+                {"agent": "Guardrail Engineer", "contribution": "Safety and robustness; the final template body"},
+                {"agent": "Template Polisher", "contribution": "Usage instructions and best practices, appended locally"}
+            ],
+            "metadata": {
                 "original_request": message,
-                "failed_at": "LangChain execution",
-                "execution_history": execution_history
-            },
-            "execution_history": execution_history,
-            "total_execution_time_ms": (time.time() - start_time) * 1000,
-            "timestamp": datetime.utcnow().isoformat()
-        }
+                "processing_pipeline": "3-Agent MAANG-Grade",
+                "quality_standard": "Production Ready"
+            }
+        },
+        "execution_history": execution_history,
+        "total_execution_time_ms": total_time,
+        "timestamp": _utc_timestamp()
+    }
+
+
+def _error_response(workflow_id: str, session_id: str, message: str, e: Exception,
+                    execution_history: list, start_ns: int) -> Dict[str, Any]:
+    """Build the error response dict, in the same format as a completed one"""
+    logger.error("❌ 3-Agent pipeline failed: %s", e, exc_info=True)
+    
+    return {
+        "workflow_id": workflow_id,
+        "session_id": session_id,
+        "status": "error", 
+        "immediate_response": f"❌ Pipeline Error: {str(e)}",
+        "final_output": {
+            "error": str(e),
+            "error_type": type(e).__name__,
+            "original_request": message,
+            "failed_at": "LangChain execution",
+            "execution_history": execution_history
+        },
+        "execution_history": execution_history,
+        "total_execution_time_ms": (perf_counter_ns() - start_ns) / 1e6,
+        "timestamp": _utc_timestamp()
+    }
+
+
+async def _run_single_call(llms: Dict[str, Any], message: str, execution_history: list) -> str:
+    """Run all three agent roles in one structured LLM call; returns the final template"""
+    logger.info("Single-call pipeline - Starting...")
+    call_start = perf_counter_ns()
+    result = await _invoke_with_retry(
+        llms["polisher"].with_structured_output(PipelineResult), SINGLE_CALL_TMPL.format_messages(message=message)
+    )
+    call_time = (perf_counter_ns() - call_start) / 1e6
+    
+    # One call serves all three roles, so each entry reports the shared call time
+    for agent, input_preview, output in (
+        ("Prompt Architect", _preview(message, 100), result.architect),
+        ("Guardrail Engineer", "Enhanced prompt from Architect", result.guardrail),
+        ("Template Polisher", "Safety-enhanced prompt from Guardrail Engineer", None),
+    ):
+        execution_history.append(_history_entry(agent, call_time, input_preview, output))
+    logger.info("Single-call pipeline completed in %.2fms", call_time)
+    return result.final
+
+
+# Throttling and transient errors back off with jitter; other 4xx fail fast
+_RETRY_POLICY = dict(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential_jitter(initial=0.5, max=8),
+    retry=retry_if_exception_type((RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)),
+    reraise=True
+)
+
+
+@retry(**_RETRY_POLICY)
+async def _invoke_with_retry(runnable, messages: list):
+    """ainvoke under _RETRY_POLICY"""
+    return await runnable.ainvoke(messages)
+
+
+@retry(**_RETRY_POLICY)
+async def _open_stream(llm, messages: list) -> tuple:
+    """Start a stream and read its first chunk, so failures before any token is sent are retried"""
+    stream = llm.astream(messages)
+    try:
+        return await stream.__anext__(), stream
+    except StopAsyncIteration:
+        return None, stream
+    except BaseException:
+        await stream.aclose()
+        raise
+
+
+async def _astream_with_retry(llm, messages: list):
+    """astream whose opening is retried under _RETRY_POLICY; errors mid-stream are not"""
+    first, stream = await _open_stream(llm, messages)
+    if first is None:
+        return
+    yield first
+    async for chunk in stream:
+        yield chunk
+
+
+async def _run_agent(llm, agent: str, messages: list, input_preview: str) -> tuple:
+    """Run one agent call; returns its output and execution_history entry"""
+    logger.info("%s - Starting...", agent)
+    agent_start = perf_counter_ns()
+    response = await _invoke_with_retry(llm, messages)
+    result = response.content
+    agent_time = (perf_counter_ns() - agent_start) / 1e6
+    logger.info("%s completed in %.2fms", agent, agent_time)
+    
+    return result, _history_entry(agent, agent_time, input_preview, result)
+
+
+def _preview(s: str, n: int = 200) -> str:
+    """First n characters of s, with an ellipsis when truncated"""
+    return s if len(s) <= n else s[:n] + "..."
+
+
+def _history_entry(agent: str, agent_time: float, input_preview: str, result: Optional[str]) -> Dict[str, Any]:
+    """execution_history entry for one completed agent; result=None (the final template) has no preview"""
+    entry = {
+        "agent": agent,
+        "execution_time_ms": agent_time,
+        "input_preview": input_preview,
+        "status": "completed"
+    }
+    # The final template is already in final_prompt_template; don't ship a second copy of its head
+    if result is not None:
+        entry["output_preview"] = _preview(result)
+    return entry
+
+
+async def _run_staged(llms: Dict[str, Any], message: str, execution_history: list) -> str:
+    """Run the Architect, then the Guardrail Engineer and Polisher concurrently on its draft"""
+    # ==================== AGENT 1: PROMPT ARCHITECT ====================
+    architect_result, architect_entry = await _run_agent(
+        llms["architect"], "Prompt Architect",
+        ARCHITECT_TMPL.format_messages(message=message),
+        _preview(message, 100)
+    )
+    execution_history.append(architect_entry)
+    
+    # ============ AGENTS 2 & 3: GUARDRAIL ENGINEER + TEMPLATE POLISHER ============
+    guardrail_task = asyncio.create_task(_run_agent(
+        llms["guardrail"], "Guardrail Engineer",
+        GUARDRAIL_TMPL.format_messages(architect_result=architect_result), "Enhanced prompt from Architect"
+    ))
+    polisher_task = asyncio.create_task(_run_agent(
+        llms["polisher"], "Template Polisher",
+        POLISHER_TMPL.format_messages(architect_result=architect_result), "Draft prompt from Architect"
+    ))
+    try:
+        (guardrail_result, guardrail_entry), (polisher_result, polisher_entry) = await asyncio.gather(
+            guardrail_task, polisher_task
+        )
+    finally:
+        # gather doesn't cancel the sibling when one agent fails (or we are cancelled)
+        guardrail_task.cancel()
+        polisher_task.cancel()
+    execution_history.extend((guardrail_entry, polisher_entry))
+    
+    # Merge locally; a third LLM round would give back the time saved by the fan-out
+    return _merge_results(guardrail_result, polisher_result)
+
+
+def _merge_results(guardrail_result: str, polisher_result: str) -> str:
+    """Final template: the Guardrail Engineer's prompt, a rule, then the Polisher's usage notes"""
+    return f"{guardrail_result.rstrip()}\n\n---\n\n{polisher_result.strip()}"
+
+
+async def _run_structured(llms: Dict[str, Any], message: str, execution_history: list) -> str:
+    """Run the Architect and a structured Guardrail Engineer, then render the template locally"""
+    architect_result, architect_entry = await _run_agent(
+        llms["architect"], "Prompt Architect",
+        ARCHITECT_TMPL.format_messages(message=message),
+        _preview(message, 100)
+    )
+    execution_history.append(architect_entry)
+    
+    logger.info("Guardrail Engineer - Starting...")
+    guardrail_start = perf_counter_ns()
+    template = await _invoke_with_retry(
+        llms["guardrail"].with_structured_output(PromptTemplateOut),
+        STRUCTURED_GUARDRAIL_TMPL.format_messages(architect_result=architect_result)
+    )
+    execution_history.append(_history_entry(
+        "Guardrail Engineer", (perf_counter_ns() - guardrail_start) / 1e6,
+        "Enhanced prompt from Architect", template.model_dump_json()
+    ))
+    
+    # The Polisher's formatting pass is a deterministic render of the structured fields
+    render_start = perf_counter_ns()
+    final_result = PROMPT_TEMPLATE_RENDER.render(**template.model_dump())
+    execution_history.append(_history_entry(
+        "Template Polisher", (perf_counter_ns() - render_start) / 1e6,
+        "Structured template from Guardrail Engineer", None
+    ))
+    return final_result
+
+
+async def _stream_staged(llms: Dict[str, Any], message: str, execution_history: list) -> AsyncIterator[Dict[str, Any]]:
+    """Staged pipeline that streams the Guardrail Engineer's tokens while the Polisher runs alongside"""
+    architect_result, architect_entry = await _run_agent(
+        llms["architect"], "Prompt Architect",
+        ARCHITECT_TMPL.format_messages(message=message),
+        _preview(message, 100)
+    )
+    execution_history.append(architect_entry)
+    yield {"type": "stage", **architect_entry}
+    
+    polisher_task = asyncio.create_task(_run_agent(
+        llms["polisher"], "Template Polisher",
+        POLISHER_TMPL.format_messages(architect_result=architect_result), "Draft prompt from Architect"
+    ))
+    try:
+        logger.info("Guardrail Engineer - Streaming...")
+        guardrail_start = perf_counter_ns()
+        parts = []
+        pending = ""  # trailing whitespace, held back until more text follows it
+        async for chunk in _astream_with_retry(
+            llms["guardrail"], GUARDRAIL_TMPL.format_messages(architect_result=architect_result)
+        ):
+            if chunk.content:
+                parts.append(chunk.content)
+                text = pending + chunk.content
+                content = text.rstrip()
+                pending = text[len(content):]
+                if content:
+                    yield {"type": "token", "content": content}
+        guardrail_result = "".join(parts)
+        guardrail_entry = _history_entry(
+            "Guardrail Engineer", (perf_counter_ns() - guardrail_start) / 1e6, "Enhanced prompt from Architect", guardrail_result
+        )
+        polisher_result, polisher_entry = await polisher_task
+    finally:
+        polisher_task.cancel()
+    
+    execution_history.extend((guardrail_entry, polisher_entry))
+    yield {"type": "stage", **guardrail_entry}
+    yield {"type": "stage", **polisher_entry}
+    
+    # Same local merge as _run_staged (the streamed tokens are guardrail_result.rstrip()),
+    # emitted as the tail of the token stream
+    yield {"type": "token", "content": _merge_results("", polisher_result)}
+
+
+_PIPELINES = {
+    "single": _run_single_call,
+    "staged": _run_staged,
+    "structured": _run_structured,
+}
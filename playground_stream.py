@@ -0,0 +1,48 @@
+"""
+Server-sent event helpers shared by app.py and simple_app.py
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import orjson
+from flask import Response, stream_with_context
+
+# Each streamed model call runs on its own worker thread
+_stream_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='playground-stream')
+
+def sse(payload, event=None):
+    """Format one server-sent event frame"""
+    frame = f"event: {event}\n" if event else ''
+    return f"{frame}data: {orjson.dumps(payload, default=str).decode()}\n\n"
+
+def sse_response(events):
+    """Wrap an iterator of SSE frames in an unbuffered text/event-stream response"""
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def stream_model_results(call_model, error_result, models, system_instruction, prompt):
+    """SSE response with each model's result as soon as it is ready, then a done event"""
+    def generate():
+        started = time.perf_counter()
+        futures = {
+            _stream_executor.submit(call_model, model_id, system_instruction, prompt): model_id
+            for model_id in models
+        }
+        try:
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = error_result(futures[future], e)
+                yield sse(result)
+        finally:
+            # Client went away; drop calls that have not started yet
+            for future in futures:
+                future.cancel()
+        yield sse({'total_time': round(time.perf_counter() - started, 3)}, event='done')
+    
+    return sse_response(generate())
@@ -6,28 +6,50 @@ Simple Flask app runner that skips ML model loading for quick testing
 from flask import Flask, render_template, request, jsonify, send_from_directory
 from dotenv import load_dotenv
 import os
+import time
+import functools
+import asyncio
+import hashlib
 import logging
+import logging.handlers
+import queue
+import atexit
+import threading
 import jinja2
 
+from flask_common import ORJSONProvider, configure_templates
+from playground_stream import stream_model_results
+
 # === Load environment variables ===
 load_dotenv()
 
 # === Initialize Flask ===
 app = Flask(__name__, static_folder="static")
+app.json = ORJSONProvider(app)
+# Let browsers cache files served via send_from_directory; Werkzeug already adds
+# ETag/Last-Modified, so revalidations come back as 304s
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 3600
 app.jinja_loader = jinja2.ChoiceLoader([
     jinja2.FileSystemLoader('.'),  # For root templates
     jinja2.FileSystemLoader('features/prompt_playground'),  # For playground
 ])
+configure_templates(app, precompile=('login_signup.html', 'home.html', 'index.html'))
 
 # === Setup logging ===
+# Request threads only enqueue records; a background listener does the file/console I/O
 os.makedirs("logs", exist_ok=True)
+_log_queue = queue.SimpleQueue()
+_log_listener = logging.handlers.QueueListener(
+    _log_queue,
+    logging.FileHandler('logs/detections.log', encoding='utf-8'),
+    logging.StreamHandler()
+)
+_log_listener.start()
+atexit.register(_log_listener.stop)
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/detections.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
+    handlers=[logging.handlers.QueueHandler(_log_queue)]
 )
 
 # === Skip ML Model Loading ===
@@ -41,14 +63,30 @@ model = None
 def root():
     return send_from_directory('.', 'index.html')
 
-@app.route('/login_signup')
-def index():
+# These pages take no parameters, so render them once and reuse the output
+@functools.lru_cache(maxsize=1)
+def _render_login():
     files = [f"File {i}" for i in range(1, 6)]
     return render_template('login_signup.html', files=files)
 
+@functools.lru_cache(maxsize=1)
+def _render_home():
+    return render_template('home.html')
+
+@app.before_request
+def _refresh_page_cache():
+    # Debug mode picks up template edits, so don't serve stale renders there
+    if app.debug:
+        _render_login.cache_clear()
+        _render_home.cache_clear()
+
+@app.route('/login_signup')
+def index():
+    return _render_login()
+
 @app.route('/home')
 def home():
-    return render_template('home.html')
+    return _render_home()
 
 @app.route('/api-test')
 def api_test():
@@ -87,8 +125,68 @@ def simple_chat():
         }), 500
 
 # === Playground API Endpoints ===
+def mock_model_response(model_id, system_instruction, prompt):
+    """One model's playground result - mock responses in simple mode"""
+    if model_id == 'gemini-2.0-flash-exp':
+        return {
+            'model': model_id,
+            'response': '🔄 Gemini API key needs to be updated (currently compromised). Please get a new key from Google AI Studio.',
+            'status': 'Configuration Required',
+            'metadata': {'latency': 0.5, 'tokens': 0, 'cost_estimate': 0}
+        }
+    elif model_id in ['gpt-4-turbo', 'gpt-3.5-turbo']:
+        return {
+            'model': model_id,
+            'response': f'✅ This would be the {model_id} response to: "{prompt}"\n\nNote: Azure OpenAI is configured but running in demo mode.',
+            'status': 'Demo Mode',
+            'metadata': {'latency': 0.3, 'tokens': 50, 'cost_estimate': 0.002}
+        }
+    else:
+        return {
+            'model': model_id,
+            'response': f'Model {model_id} response simulation.',
+            'status': 'Demo Mode',
+            'metadata': {'latency': 0.4, 'tokens': 30, 'cost_estimate': 0.001}
+        }
+
+async def call_model(model_id, system_instruction, prompt):
+    """Produce one model's playground result"""
+    return mock_model_response(model_id, system_instruction, prompt)
+
+# Identical (system_instruction, prompt, model) calls within the TTL reuse the last result
+PROMPT_CACHE_TTL = 300
+PROMPT_CACHE_MAX_ENTRIES = 4096
+_prompt_cache = {}  # key -> (expires_at, result)
+_prompt_cache_lock = threading.Lock()
+
+def _prompt_cache_key(system_instruction, prompt, model_id):
+    raw = '\x1f'.join((system_instruction, prompt, model_id)).encode()
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+async def cached_call_model(model_id, system_instruction, prompt):
+    """call_model with a short-lived in-process cache in front of it"""
+    key = _prompt_cache_key(system_instruction, prompt, model_id)
+    now = time.monotonic()
+    with _prompt_cache_lock:
+        cached = _prompt_cache.get(key)
+    if cached and cached[0] > now:
+        result = dict(cached[1])
+        result['metadata'] = {**result['metadata'], 'cache_hit': True}
+        return result
+    
+    result = await call_model(model_id, system_instruction, prompt)
+    
+    with _prompt_cache_lock:
+        if len(_prompt_cache) >= PROMPT_CACHE_MAX_ENTRIES:
+            for stale_key in [k for k, (expires_at, _) in _prompt_cache.items() if expires_at <= now]:
+                del _prompt_cache[stale_key]
+        while len(_prompt_cache) >= PROMPT_CACHE_MAX_ENTRIES:
+            del _prompt_cache[next(iter(_prompt_cache))]
+        _prompt_cache[key] = (now + PROMPT_CACHE_TTL, result)
+    return result
+
 @app.route('/api/playground/run_prompt', methods=['POST'])
-def run_prompt():
+async def run_prompt():
     """Simple playground endpoint - returns mock responses"""
     try:
         data = request.json
@@ -99,32 +197,16 @@ def run_prompt():
         if not prompt:
             return jsonify({'error': 'Prompt is required'}), 400
         
-        # Mock responses for each model
-        results = []
-        for model_id in models:
-            if model_id == 'gemini-2.0-flash-exp':
-                result = {
-                    'model': model_id,
-                    'response': '🔄 Gemini API key needs to be updated (currently compromised). Please get a new key from Google AI Studio.',
-                    'status': 'Configuration Required',
-                    'metadata': {'latency': 0.5, 'tokens': 0, 'cost_estimate': 0}
-                }
-            elif model_id in ['gpt-4-turbo', 'gpt-3.5-turbo']:
-                result = {
-                    'model': model_id,
-                    'response': f'✅ This would be the {model_id} response to: "{prompt}"\n\nNote: Azure OpenAI is configured but running in demo mode.',
-                    'status': 'Demo Mode',
-                    'metadata': {'latency': 0.3, 'tokens': 50, 'cost_estimate': 0.002}
-                }
-            else:
-                result = {
-                    'model': model_id,
-                    'response': f'Model {model_id} response simulation.',
-                    'status': 'Demo Mode',
-                    'metadata': {'latency': 0.4, 'tokens': 30, 'cost_estimate': 0.001}
-                }
-            
-            results.append(result)
+        # Fan out to every model at once so provider latencies overlap
+        outcomes = await asyncio.gather(
+            *(cached_call_model(model_id, system_instruction, prompt) for model_id in models),
+            return_exceptions=True
+        )
+        
+        results = [
+            _error_result(model_id, outcome) if isinstance(outcome, Exception) else outcome
+            for model_id, outcome in zip(models, outcomes)
+        ]
         
         return jsonify({
             'results': results,
@@ -135,6 +217,36 @@ def run_prompt():
         logging.error(f"Playground error: {e}")
         return jsonify({'error': str(e)}), 500
 
+def _error_result(model_id, error):
+    logging.error(f"Error calling {model_id}: {error}")
+    return {
+        'model': model_id,
+        'response': f'Error: {error}',
+        'status': 'Error',
+        'metadata': {'latency': 0, 'tokens': 0, 'cost_estimate': 0}
+    }
+
+# Each streamed model call runs on its own worker thread and event loop
+def _call_model_sync(model_id, system_instruction, prompt):
+    return asyncio.run(cached_call_model(model_id, system_instruction, prompt))
+
+@app.route('/api/playground/run_prompt_stream', methods=['GET', 'POST'])
+def run_prompt_stream():
+    """Playground endpoint that sends each model's result as a server-sent event as soon as it is ready"""
+    if request.method == 'POST':
+        data = request.json or {}
+        models = data.get('models', [])
+    else:  # EventSource can only GET, so accept the same fields as query params
+        data = request.args
+        models = request.args.getlist('models')
+    system_instruction = data.get('system_instruction', '')
+    prompt = data.get('prompt', '')
+    
+    if not prompt:
+        return jsonify({'error': 'Prompt is required'}), 400
+    
+    return stream_model_results(_call_model_sync, _error_result, models, system_instruction, prompt)
+
 @app.route('/api/playground/analyze_results', methods=['POST'])
 def analyze_results():
     """Mock analysis endpoint"""
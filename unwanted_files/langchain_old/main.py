@@ -2,11 +2,14 @@
 Multi-Agent Workflow System with LangChain
 FAANG-standard implementation with proper error handling, logging, and observability
 """
-from fastapi import FastAPI, HTTPException, Request, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field, validator
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
+from collections import OrderedDict
+import asyncio
 import logging
+import time
 from datetime import datetime
 import uvicorn
 from contextlib import asynccontextmanager
@@ -40,6 +43,12 @@ class Config:
     AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
     WEBHOOK_TIMEOUT = int(os.getenv("WEBHOOK_TIMEOUT", "30"))
     MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))
+    SESSION_CACHE_MAX = int(os.getenv("SESSION_CACHE_MAX", "10000"))
+    SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "3600"))
+    # Run Agent2 on the original message alongside Agent1 instead of on Agent1's output
+    PARALLEL_AGENTS = os.getenv("PARALLEL_AGENTS", "false").lower() == "true"
+    # Chain-of-thought tracing to stdout; off by default since it serializes on the stdout lock
+    LC_VERBOSE = os.getenv("LC_VERBOSE") == "1"
     
     @classmethod
     def validate(cls):
@@ -49,6 +58,14 @@ class Config:
         if missing:
             raise ValueError(f"Missing required environment variables: {missing}")
 
+# One pooled HTTP/2 client shared by every LLM and by outbound webhook calls, so
+# connections and TLS sessions to Azure are reused instead of set up per agent
+shared_async_client = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+    timeout=Config.WEBHOOK_TIMEOUT
+)
+
 # Pydantic Models for Request/Response Validation
 class WebhookPayload(BaseModel):
     """Validated webhook input schema"""
@@ -81,15 +98,34 @@ class WorkflowResponse(BaseModel):
 class MemoryManager:
     """Manages conversation memory per session with proper cleanup"""
     
-    def __init__(self):
-        self._sessions: Dict[str, ChatMessageHistory] = {}
+    def __init__(self, max_sessions: int = None, ttl_seconds: int = None):
+        # Least recently used first; each entry is (history, last_access)
+        self._sessions: OrderedDict[str, Tuple[ChatMessageHistory, float]] = OrderedDict()
+        self._max_sessions = max_sessions or Config.SESSION_CACHE_MAX
+        self._ttl = ttl_seconds or Config.SESSION_TTL_SECONDS
     
     def get_session_history(self, session_id: str) -> ChatMessageHistory:
         """Get or create session history"""
-        if session_id not in self._sessions:
-            self._sessions[session_id] = ChatMessageHistory()
-            logger.info(f"Created new session: {session_id}")
-        return self._sessions[session_id]
+        now = time.monotonic()
+        entry = self._sessions.get(session_id)
+        if entry is not None and now - entry[1] <= self._ttl:
+            self._sessions[session_id] = (entry[0], now)
+            self._sessions.move_to_end(session_id)
+            return entry[0]
+        
+        self._evict(now)
+        history = ChatMessageHistory()
+        self._sessions[session_id] = (history, now)
+        self._sessions.move_to_end(session_id)
+        logger.info(f"Created new session: {session_id}")
+        return history
+    
+    def _evict(self, now: float):
+        """Drop idle sessions past the TTL, then the least recently used beyond the cap"""
+        while self._sessions and now - next(iter(self._sessions.values()))[1] > self._ttl:
+            self._sessions.popitem(last=False)
+        while len(self._sessions) >= self._max_sessions:
+            self._sessions.popitem(last=False)
     
     def clear_session(self, session_id: str) -> bool:
         """Clear specific session"""
@@ -109,19 +145,24 @@ class AgentFactory:
     
     def __init__(self, memory_manager: MemoryManager):
         self.memory_manager = memory_manager
+        self._llms: Dict[str, AzureChatOpenAI] = {}  # One instance per deployment
         
     def create_llm(self, deployment_name: str) -> AzureChatOpenAI:
-        """Create Azure OpenAI LLM instance"""
-        return AzureChatOpenAI(
-            azure_endpoint=Config.AZURE_OPENAI_ENDPOINT,
-            api_key=Config.AZURE_OPENAI_API_KEY,
-            azure_deployment=deployment_name,
-            api_version=Config.AZURE_OPENAI_API_VERSION,
-            temperature=0.7,
-            max_tokens=1000,
-            timeout=30,
-            max_retries=Config.MAX_RETRIES
-        )
+        """Get the Azure OpenAI LLM instance for a deployment, creating it on first use"""
+        llm = self._llms.get(deployment_name)
+        if llm is None:
+            llm = self._llms[deployment_name] = AzureChatOpenAI(
+                azure_endpoint=Config.AZURE_OPENAI_ENDPOINT,
+                api_key=Config.AZURE_OPENAI_API_KEY,
+                azure_deployment=deployment_name,
+                api_version=Config.AZURE_OPENAI_API_VERSION,
+                temperature=0.7,
+                max_tokens=1000,
+                timeout=30,
+                max_retries=Config.MAX_RETRIES,
+                http_async_client=shared_async_client
+            )
+        return llm
     
     def create_agent_1(self) -> tuple[RunnableWithMessageHistory, ChatPromptTemplate]:
         """
@@ -156,7 +197,7 @@ class AgentFactory:
         agent_executor = AgentExecutor(
             agent=agent,
             tools=tools,
-            verbose=True,
+            verbose=Config.LC_VERBOSE,
             handle_parsing_errors=True,
             max_iterations=3
         )
@@ -203,7 +244,7 @@ class AgentFactory:
         agent_executor = AgentExecutor(
             agent=agent,
             tools=tools,
-            verbose=True,
+            verbose=Config.LC_VERBOSE,
             handle_parsing_errors=True,
             max_iterations=3
         )
@@ -232,7 +273,7 @@ class WorkflowOrchestrator:
     ) -> WorkflowResponse:
         """Execute complete multi-agent workflow"""
         workflow_id = str(uuid4())
-        start_time = datetime.utcnow()
+        start_ns = time.perf_counter_ns()
         
         logger.info(f"Starting workflow {workflow_id} for session {payload.session_id}")
         
@@ -240,40 +281,32 @@ class WorkflowOrchestrator:
             # Immediate response
             immediate_response = "Processing your request through our AI agents..."
             
-            # Execute Agent 1
-            agent_1_start = datetime.utcnow()
-            agent_1_output = await self._execute_agent(
-                self.agent_1,
-                payload.message,
-                payload.session_id,
-                "Agent1"
-            )
-            agent_1_time = (datetime.utcnow() - agent_1_start).total_seconds() * 1000
-            
-            agent_1_response = AgentResponse(
-                agent_name="Agent1",
-                output=agent_1_output,
-                execution_time_ms=agent_1_time
-            )
+            if Config.PARALLEL_AGENTS:
+                # Both agents work from the original message at once, so the
+                # workflow costs one LLM round trip instead of two
+                agent_1_response, agent_2_response = await asyncio.gather(
+                    self._timed_agent(self.agent_1, payload.message, payload.session_id, "Agent1"),
+                    self._timed_agent(
+                        self.agent_2,
+                        f"Original message: {payload.message}",
+                        payload.session_id,
+                        "Agent2"
+                    )
+                )
+            else:
+                # Execute Agent 1
+                agent_1_response = await self._timed_agent(
+                    self.agent_1, payload.message, payload.session_id, "Agent1"
+                )
+                
+                # Execute Agent 2 with Agent 1's output
+                agent_2_input = f"Previous agent analysis: {agent_1_response.output}\n\nOriginal message: {payload.message}"
+                agent_2_response = await self._timed_agent(
+                    self.agent_2, agent_2_input, payload.session_id, "Agent2"
+                )
+            agent_2_output = agent_2_response.output
             
-            # Execute Agent 2 with Agent 1's output
-            agent_2_start = datetime.utcnow()
-            agent_2_input = f"Previous agent analysis: {agent_1_output}\n\nOriginal message: {payload.message}"
-            agent_2_output = await self._execute_agent(
-                self.agent_2,
-                agent_2_input,
-                payload.session_id,
-                "Agent2"
-            )
-            agent_2_time = (datetime.utcnow() - agent_2_start).total_seconds() * 1000
-            
-            agent_2_response = AgentResponse(
-                agent_name="Agent2",
-                output=agent_2_output,
-                execution_time_ms=agent_2_time
-            )
-            
-            total_time = (datetime.utcnow() - start_time).total_seconds() * 1000
+            total_time = (time.perf_counter_ns() - start_ns) / 1e6
             
             return WorkflowResponse(
                 workflow_id=workflow_id,
@@ -292,6 +325,22 @@ class WorkflowOrchestrator:
                 detail=f"Workflow execution failed: {str(e)}"
             )
     
+    async def _timed_agent(
+        self,
+        agent: RunnableWithMessageHistory,
+        input_text: str,
+        session_id: str,
+        agent_name: str
+    ) -> AgentResponse:
+        """Execute an agent and wrap its output with the elapsed time"""
+        start_ns = time.perf_counter_ns()
+        output = await self._execute_agent(agent, input_text, session_id, agent_name)
+        return AgentResponse(
+            agent_name=agent_name,
+            output=output,
+            execution_time_ms=(time.perf_counter_ns() - start_ns) / 1e6
+        )
+    
     async def _execute_agent(
         self,
         agent: RunnableWithMessageHistory,
@@ -320,8 +369,8 @@ class WorkflowOrchestrator:
 class HTTPClient:
     """Async HTTP client with retry logic"""
     
-    def __init__(self):
-        self.client = httpx.AsyncClient(timeout=Config.WEBHOOK_TIMEOUT)
+    def __init__(self, client: httpx.AsyncClient = None):
+        self.client = client or shared_async_client
     
     async def post(self, url: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """POST request with retry logic"""
@@ -340,6 +389,31 @@ class HTTPClient:
         """Close HTTP client"""
         await self.client.aclose()
 
+# Request handlers only enqueue metrics; one background task logs them in batches
+METRICS_QUEUE_MAX = 10000
+METRICS_BATCH_SIZE = 100
+_metrics_q: asyncio.Queue = asyncio.Queue(maxsize=METRICS_QUEUE_MAX)
+
+def record_metrics(workflow_id: str, execution_time: float):
+    """Queue workflow metrics for the drain task; dropped when the queue is full"""
+    try:
+        _metrics_q.put_nowait((workflow_id, execution_time))
+    except asyncio.QueueFull:
+        pass
+
+def _log_metrics_batch(batch: List[Tuple[str, float]]):
+    logger.info("Workflow metrics:\n" + "\n".join(
+        f"  {workflow_id} - Execution time: {execution_time}ms" for workflow_id, execution_time in batch
+    ))
+
+async def _drain_metrics():
+    """Log queued metrics, up to METRICS_BATCH_SIZE entries per log call"""
+    while True:
+        batch = [await _metrics_q.get()]
+        while len(batch) < METRICS_BATCH_SIZE and not _metrics_q.empty():
+            batch.append(_metrics_q.get_nowait())
+        _log_metrics_batch(batch)
+
 # FastAPI Application
 memory_manager = MemoryManager()
 agent_factory = AgentFactory(memory_manager)
@@ -351,9 +425,16 @@ async def lifespan(app: FastAPI):
     """Application lifespan management"""
     # Startup
     Config.validate()
+    metrics_task = asyncio.create_task(_drain_metrics())
     logger.info("Application started successfully")
     yield
     # Shutdown
+    metrics_task.cancel()
+    remaining = []
+    while not _metrics_q.empty():
+        remaining.append(_metrics_q.get_nowait())
+    if remaining:
+        _log_metrics_batch(remaining)
     await http_client.close()
     logger.info("Application shutdown complete")
 
@@ -365,10 +446,7 @@ app = FastAPI(
 )
 
 @app.post("/webhook", response_model=WorkflowResponse)
-async def webhook_endpoint(
-    payload: WebhookPayload,
-    background_tasks: BackgroundTasks
-):
+async def webhook_endpoint(payload: WebhookPayload):
     """
     Main webhook endpoint for multi-agent workflow processing
     
@@ -382,11 +460,7 @@ async def webhook_endpoint(
         response = await workflow_orchestrator.execute_workflow(payload)
         
         # Log metrics for monitoring
-        background_tasks.add_task(
-            log_metrics,
-            workflow_id=response.workflow_id,
-            execution_time=response.total_execution_time_ms
-        )
+        record_metrics(response.workflow_id, response.total_execution_time_ms)
         
         return response
         
@@ -425,10 +499,6 @@ async def root():
         }
     }
 
-async def log_metrics(workflow_id: str, execution_time: float):
-    """Background task for logging metrics"""
-    logger.info(f"Workflow {workflow_id} metrics - Execution time: {execution_time}ms")
-
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
@@ -3,43 +3,117 @@ Enhanced Multi-Agent Workflow System with N8N-Style Engine Integration
 Combines FastAPI with dynamic workflow configuration
 """
 
-from fastapi import FastAPI, HTTPException, Request, BackgroundTasks
-from fastapi.responses import JSONResponse, HTMLResponse
-from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any, List
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, AliasChoices, field_validator
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from pydantic_core import PydanticCustomError
+from typing import Optional, Dict, Any, List, Tuple, Literal, Callable, Awaitable, AsyncIterator
+import asyncio
 import logging
-from datetime import datetime
+import logging.handlers
+import queue
+import atexit
+from datetime import datetime, timezone
 import uvicorn
 import json
+import orjson
 import os
+import time
+import hashlib
+from uuid import uuid4
+from ulid import ULID
 from contextlib import asynccontextmanager
+from functools import lru_cache
+from types import MappingProxyType
+import dataclasses
 
 # Import our n8n-style workflow engine
 from n8n_workflow_engine import (
     WorkflowEngine, 
     WorkflowDefinition, 
+    CompiledWorkflow,
+    compile_workflow,
     NodeConfig, 
     Connection,
-    NodeType,
-    create_n8n_workflow_example,
-    create_prompt_engineering_workflow  # New import for your specific workflow
+    NodeType
 )
 
-# Import Azure OpenAI components
-from langchain_openai import AzureChatOpenAI
+# Azure OpenAI components are imported on first use (see _build_base_llm)
+from langchain_core.globals import set_llm_cache
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.outputs import ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import PrivateAttr
 import httpx
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging: handlers run on a listener thread so log I/O never blocks the event loop
+_log_queue = queue.SimpleQueue()
+_log_listener = logging.handlers.QueueListener(_log_queue, logging.StreamHandler())
+_log_listener.start()
+atexit.register(_log_listener.stop)
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    handlers=[logging.handlers.QueueHandler(_log_queue)]
+)
 logger = logging.getLogger(__name__)
 
+# Token encoder used to reject oversized messages before they reach the agents
+try:
+    import tiktoken
+    TOKEN_ENCODER = tiktoken.encoding_for_model("gpt-4")
+except Exception as e:
+    TOKEN_ENCODER = None
+    logger.warning(f"tiktoken unavailable, falling back to estimated token counts: {e}")
+
 # Configuration
-class Config:
-    AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
-    AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY") or os.getenv("OPENAI_API_KEY")
-    AZURE_OPENAI_DEPLOYMENT_1 = os.getenv("AZURE_OPENAI_DEPLOYMENT_1", "gpt-4")
-    AZURE_OPENAI_DEPLOYMENT_2 = os.getenv("AZURE_OPENAI_DEPLOYMENT_2", "gpt-4")
-    AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
+class Settings(BaseSettings):
+    """Environment-driven settings, read and validated once at import"""
+    model_config = SettingsConfigDict(frozen=True)
+    
+    azure_openai_endpoint: Optional[str] = None
+    azure_openai_api_key: Optional[str] = Field(
+        default=None,
+        validation_alias=AliasChoices("AZURE_OPENAI_API_KEY", "OPENAI_API_KEY")
+    )
+    azure_openai_deployment_1: str = "gpt-4"
+    azure_openai_deployment_2: str = "gpt-4"
+    azure_openai_api_version: str = "2024-02-15-preview"
+    metrics_queue_size: int = 10000
+    metrics_workers: int = 4
+    metrics_flush_interval: float = 0.5
+    metrics_batch_size: int = 100
+    max_message_tokens: int = 4096
+    task_ttl_seconds: int = 3600
+    keep_alive_timeout: int = 75
+    max_inflight: int = 64
+    scheduler_max_concurrency: int = 0  # Nodes running at once across runs; 0 = unlimited
+    compression_min_size: int = 1024
+    llm_cache: Literal["memory", "sqlite", "off"] = "off"
+    llm_cache_path: str = ".llm_cache.db"
+    llm_cache_max_entries: int = 1024  # LRU bound for llm_cache="memory"
+    workflow_cache_ttl: float = 0  # >0 reuses results of identical stateless runs (opt-in)
+    workflow_cache_max_entries: int = 1024
+    redis_url: Optional[str] = None  # Shares workflows and session memory across workers
+    redis_max_connections: int = 50
+    session_ttl_seconds: int = 86400
+    session_max_messages: int = 200
+    llm_batch_size: int = 1  # >1 groups concurrent LLM calls via BatchingLLMProxy (opt-in)
+    llm_batch_latency_ms: float = 25
+    alt_svc: Optional[str] = None  # e.g. 'h3=":443"; ma=86400' when a proxy terminates HTTP/3
+
+settings = Settings()
+
+def count_tokens(text: str) -> int:
+    """Count prompt tokens, estimating ~4 bytes per token without tiktoken"""
+    if TOKEN_ENCODER is None:
+        return len(text.encode("utf-8")) // 4
+    return len(TOKEN_ENCODER.encode(text))
 
 # Pydantic Models
 class WorkflowRequest(BaseModel):
@@ -48,6 +122,22 @@ class WorkflowRequest(BaseModel):
     session_id: Optional[str] = Field(default=None, description="Session ID for memory")
     workflow_id: Optional[str] = Field(default=None, description="Specific workflow to use")
     metadata: Optional[Dict[str, Any]] = Field(default_factory=dict)
+    
+    @field_validator("message")
+    @classmethod
+    def check_token_budget(cls, v: str) -> str:
+        # A token spans at least one byte, so short messages can skip encoding
+        if len(v.encode("utf-8")) <= settings.max_message_tokens:
+            return v
+        
+        token_count = count_tokens(v)
+        if token_count > settings.max_message_tokens:
+            raise PydanticCustomError(
+                "message_too_long",
+                "Message is {token_count} tokens, limit is {limit}",
+                {"token_count": token_count, "limit": settings.max_message_tokens}
+            )
+        return v
 
 class WorkflowDefinitionRequest(BaseModel):
     """Request to create/update workflow definition"""
@@ -67,36 +157,218 @@ class WorkflowResponse(BaseModel):
     total_execution_time_ms: float
     timestamp: str
 
+# Shared HTTP connection pool for every LLM client (closed in lifespan shutdown)
+shared_http_client = httpx.AsyncClient(
+    limits=httpx.Limits(max_keepalive_connections=100, max_connections=200, keepalive_expiry=60),
+    http2=True,
+    timeout=30
+)
+
 # LLM Factory for Azure OpenAI
-def create_azure_llm(model_config: Dict[str, Any] = None) -> AzureChatOpenAI:
-    """Create Azure OpenAI LLM instance"""
+def create_azure_llm(model_config: Dict[str, Any] = None) -> BaseChatModel:
+    """Get a (cached) Azure OpenAI LLM instance for the given model config"""
     config = model_config or {}
+    return _build_llm(
+        config.get('deployment'),
+        config.get('temperature', 0.7),
+        config.get('max_tokens', 1000)
+    )
+
+class BatchingLLMProxy(BaseChatModel):
+    """Chat model that buffers concurrent calls and flushes them together through llm.agenerate
+
+    This only groups calls and dedupes identical prompts within the window; the provider
+    still receives one request per distinct prompt, not a single multi-prompt request.
+    """
+    llm: BaseChatModel
+    # The wrapped model already consults the global LLM cache; don't look up and store twice
+    cache: Optional[bool] = False
+    max_batch_size: int = 8
+    max_latency_ms: float = 25
+    
+    _pending: List[Tuple[Any, Any, Dict[str, Any], asyncio.Future]] = PrivateAttr(default_factory=list)
+    _flush_handle: Optional[asyncio.TimerHandle] = PrivateAttr(default=None)
+    
+    @property
+    def _llm_type(self) -> str:
+        return f"batching-{self.llm._llm_type}"
+    
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+    
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return self.llm._generate(messages, stop=stop, **kwargs)
+    
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((messages, stop, kwargs, future))
+        
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_latency_ms / 1000, self._flush)
+        
+        return await future
+    
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        
+        # Calls can only share a request when stop words and bound tools match
+        groups: Dict[str, list] = {}
+        for item in batch:
+            key = json.dumps([item[1], item[2]], sort_keys=True, default=str)
+            groups.setdefault(key, []).append(item)
+        for items in groups.values():
+            asyncio.create_task(self._dispatch(items))
+    
+    async def _dispatch(self, items: list):
+        _, stop, kwargs, _ = items[0]
+        
+        # Identical prompts within the window share a single completion
+        prompt_index: Dict[str, int] = {}
+        prompts = []
+        slots = []
+        for messages, _, _, _ in items:
+            key = json.dumps([m.model_dump() for m in messages], sort_keys=True, default=str)
+            if key not in prompt_index:
+                prompt_index[key] = len(prompts)
+                prompts.append(messages)
+            slots.append(prompt_index[key])
+        
+        try:
+            result = await self.llm.agenerate(prompts, stop=stop, **kwargs)
+        except Exception as e:
+            for *_, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for (*_, future), slot in zip(items, slots):
+            if not future.done():
+                future.set_result(ChatResult(generations=result.generations[slot], llm_output=result.llm_output))
+
+@lru_cache(maxsize=32)
+def _build_llm(deployment: Optional[str], temperature: float, max_tokens: int) -> BaseChatModel:
+    """Create an LLM client; cached so identical configs share one instance"""
+    llm = _build_base_llm(deployment, temperature, max_tokens)
+    if settings.llm_batch_size > 1:
+        return BatchingLLMProxy(
+            llm=llm,
+            max_batch_size=settings.llm_batch_size,
+            max_latency_ms=settings.llm_batch_latency_ms
+        )
+    return llm
+
+# Chat model classes, resolved on the first LLM build to keep langchain_openai off the import path
+_azure_llm_cls = None
+_openai_llm_cls = None
+
+def _build_base_llm(deployment: Optional[str], temperature: float, max_tokens: int) -> BaseChatModel:
+    global _azure_llm_cls, _openai_llm_cls
     
     # Check if we have Azure configuration
-    if Config.AZURE_OPENAI_ENDPOINT:
-        return AzureChatOpenAI(
-            azure_endpoint=Config.AZURE_OPENAI_ENDPOINT,
-            api_key=Config.AZURE_OPENAI_API_KEY,
-            azure_deployment=config.get('deployment', Config.AZURE_OPENAI_DEPLOYMENT_1),
-            api_version=Config.AZURE_OPENAI_API_VERSION,
-            temperature=config.get('temperature', 0.7),
-            max_tokens=config.get('max_tokens', 1000),
+    if settings.azure_openai_endpoint:
+        if _azure_llm_cls is None:
+            from langchain_openai import AzureChatOpenAI
+            _azure_llm_cls = AzureChatOpenAI
+        return _azure_llm_cls(
+            azure_endpoint=settings.azure_openai_endpoint,
+            api_key=settings.azure_openai_api_key,
+            azure_deployment=deployment or settings.azure_openai_deployment_1,
+            api_version=settings.azure_openai_api_version,
+            temperature=temperature,
+            max_tokens=max_tokens,
             timeout=30,
-            max_retries=3
+            max_retries=3,
+            http_async_client=shared_http_client
         )
     else:
         # Fallback to standard OpenAI
-        from langchain_openai import ChatOpenAI
-        return ChatOpenAI(
-            model=config.get('deployment', 'gpt-4o-mini'),
-            temperature=config.get('temperature', 0.7),
-            max_tokens=config.get('max_tokens', 1000),
+        if _openai_llm_cls is None:
+            from langchain_openai import ChatOpenAI
+            _openai_llm_cls = ChatOpenAI
+        return _openai_llm_cls(
+            model=deployment or 'gpt-4o-mini',
+            temperature=temperature,
+            max_tokens=max_tokens,
             timeout=30,
-            max_retries=3
+            max_retries=3,
+            http_async_client=shared_http_client
         )
 
 # Global workflow engine
-workflow_engine = WorkflowEngine(llm_factory=create_azure_llm)
+workflow_engine = WorkflowEngine(
+    llm_factory=create_azure_llm,
+    max_concurrency=settings.scheduler_max_concurrency
+)
+
+# Caps concurrent workflow executions; excess requests wait here cheaply
+EXEC_SEM = asyncio.Semaphore(settings.max_inflight)
+
+# Recent results of stateless workflow runs: key -> (expires_at, result)
+workflow_result_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+def configure_llm_cache():
+    """Install LangChain's global LLM response cache"""
+    if settings.llm_cache == "memory":
+        from langchain_core.caches import InMemoryCache
+        set_llm_cache(InMemoryCache(maxsize=settings.llm_cache_max_entries))
+    elif settings.llm_cache == "sqlite":
+        from langchain_community.cache import SQLiteCache
+        set_llm_cache(SQLiteCache(database_path=settings.llm_cache_path))
+    logger.info(f"LLM cache: {settings.llm_cache}")
+
+# Nodes whose effects must happen on every run, so their workflows are never served from cache
+_SIDE_EFFECT_NODE_TYPES = frozenset({NodeType.HTTP_REQUEST})
+
+def _workflow_cache_key(workflow_id: str, input_data: Dict[str, Any]) -> str:
+    payload = json.dumps(input_data, sort_keys=True, default=str)
+    return hashlib.sha256(f"{workflow_id}:{payload}".encode("utf-8")).hexdigest()
+
+async def run_workflow(
+    workflow: CompiledWorkflow,
+    input_data: Dict[str, Any],
+    session_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """Execute a workflow under EXEC_SEM, reusing recent results for stateless requests"""
+    # Session-scoped runs carry memory, so their results are never shared
+    if (
+        session_id
+        or settings.workflow_cache_ttl <= 0
+        or any(node.node_type in _SIDE_EFFECT_NODE_TYPES for node in workflow.definition.nodes)
+    ):
+        async with EXEC_SEM:
+            return await workflow_engine.execute_workflow(workflow, input_data, session_id=session_id)
+    
+    key = _workflow_cache_key(workflow.workflow_id, input_data)
+    now = time.monotonic()
+    cached = workflow_result_cache.get(key)
+    if cached and cached[0] > now:
+        logger.debug("Workflow cache hit for %s", workflow.workflow_id)
+        # Only the outputs are shared; each request still gets its own session and timestamp
+        return {
+            **cached[1],
+            'session_id': str(uuid4()),
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        }
+    
+    async with EXEC_SEM:
+        result = await workflow_engine.execute_workflow(workflow, input_data)
+    
+    # Only cache clean runs (unconfigured callbacks are skipped, not failed)
+    if all(entry['status'] in ('completed', 'skipped') for entry in result['execution_history']):
+        now = time.monotonic()
+        for stale_key in [k for k, (expires_at, _) in workflow_result_cache.items() if expires_at <= now]:
+            del workflow_result_cache[stale_key]
+        while len(workflow_result_cache) >= settings.workflow_cache_max_entries:
+            del workflow_result_cache[next(iter(workflow_result_cache))]
+        workflow_result_cache[key] = (now + settings.workflow_cache_ttl, result)
+    
+    return result
 
 # Replace the process_prompt_engineering_sync function with actual LangChain implementation
 def process_prompt_engineering_sync(message: str, session_id: str = None) -> Dict[str, Any]:
@@ -233,7 +505,7 @@ Deliver a polished, production-ready prompt template that meets MAANG engineerin
             },
             "execution_history": execution_history,
             "total_execution_time_ms": total_time,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": utc_now_iso()
         }
         
     except Exception as e:
@@ -252,28 +524,265 @@ Deliver a polished, production-ready prompt template that meets MAANG engineerin
             },
             "execution_history": execution_history,
             "total_execution_time_ms": (time.time() - start_time) * 1000,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": utc_now_iso()
         }
 
 # Workflow storage (in production, use a proper database)
-workflow_store: Dict[str, WorkflowDefinition] = {}
+# Readers get immutable views; writes go through register/unregister_workflow
+_workflows: Dict[str, WorkflowDefinition] = {}
+_compiled_workflows: Dict[str, CompiledWorkflow] = {}
+workflow_store = MappingProxyType(_workflows)
+compiled_store = MappingProxyType(_compiled_workflows)
+
+def register_workflow(key: str, workflow: WorkflowDefinition, compiled: Optional[CompiledWorkflow] = None):
+    """Store a workflow definition alongside its compiled DAG"""
+    _compiled_workflows[key] = compiled or compile_workflow(workflow)
+    _workflows[key] = workflow
+    invalidate_workflow_list()
+
+def unregister_workflow(key: str):
+    """Remove a workflow and its compiled DAG"""
+    del _workflows[key]
+    del _compiled_workflows[key]
+    invalidate_workflow_list()
+
+# Serialized GET /workflows payload, rebuilt only after a mutation. With Redis,
+# wf_version tracks mutations made by other workers.
+_workflow_list_cache: Optional[bytes] = None
+_workflow_list_version: Optional[bytes] = None
+_workflow_list_lock = asyncio.Lock()
+
+def invalidate_workflow_list():
+    global _workflow_list_cache
+    _workflow_list_cache = None
+
+# Shared Redis backend (connected in lifespan when REDIS_URL is set). Workflows
+# registered at startup exist in every worker; the rest live under wf:{key}.
+redis_client = None
+redis_sync_client = None  # Only for sync BaseChatMessageHistory callers
+_builtin_workflow_keys: set = set()
+_remote_workflow_blobs: Dict[str, bytes] = {}  # Blob each remote workflow was compiled from
+
+def _pack_workflow(workflow: WorkflowDefinition) -> bytes:
+    import msgpack
+    data = dataclasses.asdict(workflow)
+    for node in data['nodes']:
+        node['node_type'] = node['node_type'].value
+    return msgpack.packb(data, default=str)
+
+def _unpack_workflow(blob: bytes) -> WorkflowDefinition:
+    import msgpack
+    data = msgpack.unpackb(blob)
+    return WorkflowDefinition(
+        workflow_id=data['workflow_id'],
+        name=data['name'],
+        nodes=[NodeConfig(**{**node, 'node_type': NodeType(node['node_type'])}) for node in data['nodes']],
+        connections=[Connection(**conn) for conn in data['connections']],
+        settings=data['settings']
+    )
+
+def _sync_remote_workflow(key: str, blob: Optional[bytes]):
+    """Bring the local copy of a Redis-backed workflow in line with its stored blob"""
+    if blob is None:
+        if key in _workflows:
+            unregister_workflow(key)
+        _remote_workflow_blobs.pop(key, None)
+    elif _remote_workflow_blobs.get(key) != blob:
+        register_workflow(key, _unpack_workflow(blob))
+        _remote_workflow_blobs[key] = blob
+
+async def lookup_workflow(key: str) -> Optional[CompiledWorkflow]:
+    """Look up a compiled workflow, reading through to Redis for user-created ones"""
+    if redis_client is not None and key not in _builtin_workflow_keys:
+        _sync_remote_workflow(key, await redis_client.get(f"wf:{key}"))
+    return compiled_store.get(key)
+
+async def load_all_workflows() -> Dict[str, WorkflowDefinition]:
+    """All workflows visible to this worker, refreshed from Redis when configured"""
+    if redis_client is not None:
+        keys = [key async for key in redis_client.scan_iter(match="wf:*", count=500)]
+        blobs = await redis_client.mget(keys) if keys else []
+        remote = {key.decode()[3:]: blob for key, blob in zip(keys, blobs)}
+        for key in set(_remote_workflow_blobs) | set(remote):
+            _sync_remote_workflow(key, remote.get(key))
+    return dict(workflow_store)
+
+async def save_workflow(workflow: WorkflowDefinition):
+    """Compile and store a workflow locally and, when configured, in Redis"""
+    register_workflow(workflow.workflow_id, workflow)
+    if redis_client is not None:
+        blob = _pack_workflow(workflow)
+        await redis_client.set(f"wf:{workflow.workflow_id}", blob)
+        await redis_client.incr("wf_version")
+        _remote_workflow_blobs[workflow.workflow_id] = blob
+
+async def delete_stored_workflow(key: str) -> bool:
+    """Delete a workflow; returns False if it did not exist"""
+    existed = key in _workflows
+    if redis_client is not None and key not in _builtin_workflow_keys:
+        existed = bool(await redis_client.delete(f"wf:{key}"))
+        await redis_client.incr("wf_version")
+        _remote_workflow_blobs.pop(key, None)
+    if key in _workflows:
+        unregister_workflow(key)
+    return existed
+
+class RedisStreamChatHistory(BaseChatMessageHistory):
+    """Session memory kept in a Redis stream that expires SESSION_TTL_SECONDS after the last turn"""
+    
+    def __init__(self, client, sync_client, session_id: str):
+        self.client = client
+        # Sync consumers (e.g. RunnableWithMessageHistory.invoke) can't await, so they use their own pool
+        self.sync_client = sync_client
+        self.key = f"session:{session_id}"
+    
+    @staticmethod
+    def _decode(entries) -> List[BaseMessage]:
+        return messages_from_dict([orjson.loads(fields[b"m"]) for _, fields in entries])
+    
+    def _queue_add(self, pipe, messages: List[BaseMessage]):
+        for message in messages:
+            pipe.xadd(
+                self.key,
+                {"m": orjson.dumps(message_to_dict(message))},
+                maxlen=settings.session_max_messages,
+                approximate=True
+            )
+        pipe.expire(self.key, settings.session_ttl_seconds)
+    
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return self._decode(self.sync_client.xrange(self.key))
+    
+    async def aget_messages(self) -> List[BaseMessage]:
+        return self._decode(await self.client.xrange(self.key))
+    
+    def add_messages(self, messages: List[BaseMessage]) -> None:
+        with self.sync_client.pipeline(transaction=False) as pipe:
+            self._queue_add(pipe, messages)
+            pipe.execute()
+    
+    async def aadd_messages(self, messages: List[BaseMessage]) -> None:
+        async with self.client.pipeline(transaction=False) as pipe:
+            self._queue_add(pipe, messages)
+            await pipe.execute()
+    
+    def clear(self) -> None:
+        self.sync_client.delete(self.key)
+    
+    async def aclear(self) -> None:
+        await self.client.delete(self.key)
+
+async def connect_redis():
+    """Open the Redis pools and route workflow storage and session memory through them"""
+    global redis_client, redis_sync_client
+    import redis
+    import redis.asyncio as aioredis
+    
+    redis_client = aioredis.from_url(settings.redis_url, max_connections=settings.redis_max_connections)
+    await redis_client.ping()
+    redis_sync_client = redis.from_url(settings.redis_url, max_connections=settings.redis_max_connections)
+    workflow_engine.history_factory = lambda session_id: RedisStreamChatHistory(
+        redis_client, redis_sync_client, session_id
+    )
+    logger.info("Connected to Redis for workflow storage and session memory")
+
+# Async task results live in Redis (task:{id} hashes), so any worker can answer
+# GET /tasks/{id}; running_tasks only tracks this worker's coroutines for shutdown
+running_tasks: set = set()
+
+async def save_task(task_id: str, **fields):
+    """Write task fields to Redis; the hash expires TASK_TTL_SECONDS after its last update"""
+    key = f"task:{task_id}"
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.hset(key, mapping={name: orjson.dumps(value, default=str) for name, value in fields.items()})
+        pipe.expire(key, settings.task_ttl_seconds)
+        await pipe.execute()
+
+async def load_task(task_id: str) -> Optional[Dict[str, Any]]:
+    """Fetch a task's fields from Redis, or None if unknown or expired"""
+    fields = await redis_client.hgetall(f"task:{task_id}")
+    return {name.decode(): orjson.loads(value) for name, value in fields.items()} if fields else None
 
 # Initialize with default workflows
 def initialize_default_workflows():
     """Initialize with default workflows including prompt engineering"""
+    # Built-ins arrive already compiled from the engine module
+    from n8n_workflow_engine import N8N_WORKFLOW_EXAMPLE, PROMPT_ENGINEERING_WORKFLOW
+    
     # General workflow
-    default_workflow = create_n8n_workflow_example()
-    workflow_store['default'] = default_workflow
-    workflow_store['general'] = default_workflow
+    default_compiled = N8N_WORKFLOW_EXAMPLE
+    default_workflow = default_compiled.definition
+    register_workflow('default', default_workflow, default_compiled)
+    register_workflow('general', default_workflow, default_compiled)
     
     # Prompt engineering workflow
-    prompt_eng_workflow = create_prompt_engineering_workflow()
-    workflow_store['prompt_engineering'] = prompt_eng_workflow
-    workflow_store['prompt_eng'] = prompt_eng_workflow  # Short alias
+    prompt_eng_compiled = PROMPT_ENGINEERING_WORKFLOW
+    prompt_eng_workflow = prompt_eng_compiled.definition
+    register_workflow('prompt_engineering', prompt_eng_workflow, prompt_eng_compiled)
+    register_workflow('prompt_eng', prompt_eng_workflow, prompt_eng_compiled)  # Short alias
     
     logger.info(f"Initialized default workflow: {default_workflow.workflow_id}")
     logger.info(f"Initialized prompt engineering workflow: {prompt_eng_workflow.workflow_id}")
     logger.info(f"Available workflows: {list(workflow_store.keys())}")
+    _builtin_workflow_keys.update(workflow_store.keys())
+
+# Cached wall clock (second resolution) for response timestamps
+_NOW_ISO = ""
+
+def _format_now() -> str:
+    # Naive UTC string keeps the existing timestamp format without the deprecated utcnow()
+    return datetime.now(timezone.utc).replace(microsecond=0, tzinfo=None).isoformat()
+
+def utc_now_iso() -> str:
+    """Current UTC time as ISO string, refreshed once per second by the clock task"""
+    return _NOW_ISO or _format_now()
+
+async def _clock_ticker():
+    """Refresh the cached timestamp once per second"""
+    global _NOW_ISO
+    while True:
+        _NOW_ISO = _format_now()
+        # Wake just after each second boundary so the string never lags by ~1s
+        await asyncio.sleep(1 - time.time() % 1)
+
+# Metrics pipeline
+async def _metrics_worker(queue: asyncio.Queue):
+    """Drain queued workflow metrics and flush them in batches"""
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await queue.get()]
+        deadline = loop.time() + settings.metrics_flush_interval
+        
+        # Collect whatever else arrives within the flush window
+        while len(batch) < settings.metrics_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        
+        try:
+            # Sinks run concurrently so a slow one (e.g. a DB insert) doesn't serialize the rest
+            results = await asyncio.gather(
+                *(sink(**metrics) for metrics in batch for sink in metrics_sinks),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error(f"Metrics sink failed: {result}")
+        finally:
+            for _ in batch:
+                queue.task_done()
+
+def enqueue_workflow_metrics(**metrics):
+    """Hand metrics to the background workers without blocking the request"""
+    try:
+        app.state.metrics_q.put_nowait(metrics)
+    except asyncio.QueueFull:
+        logger.warning(f"Metrics queue full, dropping metrics for workflow {metrics.get('workflow_id')}")
 
 # FastAPI App
 @asynccontextmanager
@@ -282,6 +791,15 @@ async def lifespan(app: FastAPI):
     # Startup
     try:
         initialize_default_workflows()  # Updated function name
+        configure_llm_cache()
+        if settings.redis_url:
+            await connect_redis()
+        app.state.clock_task = asyncio.create_task(_clock_ticker())
+        app.state.metrics_q = asyncio.Queue(maxsize=settings.metrics_queue_size)
+        app.state.metrics_workers = [
+            asyncio.create_task(_metrics_worker(app.state.metrics_q))
+            for _ in range(settings.metrics_workers)
+        ]
         logger.info("Application started successfully")
     except Exception as e:
         logger.error(f"Startup failed: {e}")
@@ -290,19 +808,109 @@ async def lifespan(app: FastAPI):
     yield
     
     # Shutdown
+    try:
+        await asyncio.wait_for(app.state.metrics_q.join(), timeout=5)
+    except asyncio.TimeoutError:
+        logger.warning("Timed out flushing pending metrics")
+    for worker in app.state.metrics_workers:
+        worker.cancel()
+    await asyncio.gather(*app.state.metrics_workers, return_exceptions=True)
+    for task in list(running_tasks):
+        task.cancel()
+    app.state.clock_task.cancel()
+    await shared_http_client.aclose()
+    await workflow_engine.aclose()
+    if redis_client is not None:
+        await redis_client.aclose()
+    if redis_sync_client is not None:
+        redis_sync_client.close()
     logger.info("Application shutdown")
 
 app = FastAPI(
     title="N8N-Style Multi-Agent Workflow System",
     description="Dynamic workflow configuration and execution with LangChain agents",
     version="2.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
+class AltSvcMiddleware:
+    """Advertise HTTP/2 / HTTP/3 endpoints served by the fronting proxy"""
+    
+    def __init__(self, app, alt_svc: str):
+        self.app = app
+        self.header = (b"alt-svc", alt_svc.encode("latin-1"))
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        async def send_with_alt_svc(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), self.header]
+            await send(message)
+        
+        await self.app(scope, receive, send_with_alt_svc)
+
+if settings.alt_svc:
+    app.add_middleware(AltSvcMiddleware, alt_svc=settings.alt_svc)
+
+class CompressionMiddleware:
+    """Brotli (or gzip) compress responses, leaving event streams unbuffered"""
+    
+    def __init__(self, app, minimum_size: int):
+        self.app = app
+        try:
+            # Optional dependency; negotiates br and falls back to gzip itself
+            from brotli_asgi import BrotliMiddleware
+            self.compressed_app = BrotliMiddleware(app, minimum_size=minimum_size)
+        except ImportError:
+            self.compressed_app = GZipMiddleware(app, minimum_size=minimum_size)
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or any(
+            name == b"accept" and b"text/event-stream" in value for name, value in scope["headers"]
+        ):
+            await self.app(scope, receive, send)
+            return
+        await self.compressed_app(scope, receive, send)
+
+app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_min_size)
+
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    """Report oversized messages as 413 instead of a generic 422"""
+    for error in exc.errors():
+        if error.get("type") == "message_too_long":
+            return JSONResponse(status_code=413, content={"detail": error.get("msg")})
+    return await request_validation_exception_handler(request, exc)
+
 # API Endpoints
 
-@app.post("/webhook", response_model=WorkflowResponse)
-async def webhook_endpoint(request: WorkflowRequest, background_tasks: BackgroundTasks):
+def _sse(event: Dict[str, Any]) -> bytes:
+    """Encode an engine event as a server-sent event frame"""
+    return b"event: " + event['event'].encode() + b"\ndata: " + orjson.dumps(event, default=str) + b"\n\n"
+
+async def stream_workflow_events(
+    workflow: CompiledWorkflow,
+    input_data: Dict[str, Any],
+    session_id: Optional[str],
+    immediate_response: str
+) -> AsyncIterator[bytes]:
+    """Yield SSE frames: the immediate response first, then node events as they complete"""
+    yield _sse({'event': 'immediate_response', 'immediate_response': immediate_response})
+    
+    async with EXEC_SEM:
+        async for event in workflow_engine.stream_workflow(workflow, input_data, session_id=session_id):
+            if event['event'] == 'workflow_complete':
+                enqueue_workflow_metrics(
+                    workflow_id=event['result']['workflow_id'],
+                    execution_time=event['result']['total_execution_time_ms']
+                )
+            yield _sse(event)
+
+@app.post("/webhook", responses={200: {"model": WorkflowResponse}})
+async def webhook_endpoint(request: WorkflowRequest, http_request: Request = None):
     """
     Main webhook endpoint that executes n8n-style workflows
     
@@ -311,11 +919,13 @@ async def webhook_endpoint(request: WorkflowRequest, background_tasks: Backgroun
     2. Provides immediate response 
     3. Executes multi-agent workflow
     4. Returns comprehensive results
+    
+    Send `Accept: text/event-stream` to receive node events as they happen.
     """
     try:
         # Get workflow to execute
         workflow_id = request.workflow_id or 'default'
-        workflow = workflow_store.get(workflow_id)
+        workflow = await lookup_workflow(workflow_id)
         
         if not workflow:
             raise HTTPException(
@@ -323,55 +933,103 @@ async def webhook_endpoint(request: WorkflowRequest, background_tasks: Backgroun
                 detail=f"Workflow {workflow_id} not found"
             )
         
-        logger.info(f"Executing workflow {workflow_id} for session {request.session_id}")
+        logger.debug("Executing workflow %s for session %s", workflow_id, request.session_id)
         
-        # Execute workflow
-        result = await workflow_engine.execute_workflow(
-            workflow,
-            {
-                'message': request.message,
-                'metadata': request.metadata
-            },
-            session_id=request.session_id
-        )
+        input_data = {
+            'message': request.message,
+            'metadata': request.metadata
+        }
         
-        # Get immediate response from workflow results
-        immediate_response = "Processing your request through our AI agents..."
-        if result.get('execution_history'):
-            first_result = result['execution_history'][0]
-            if 'immediate_response' in str(first_result):
-                immediate_response = "Request received and processing started"
+        # Stream node events instead of buffering the whole result
+        if http_request is not None and "text/event-stream" in http_request.headers.get("accept", ""):
+            return StreamingResponse(
+                stream_workflow_events(
+                    workflow,
+                    input_data,
+                    request.session_id,
+                    "Request received and processing started"
+                ),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
         
-        # Format response
-        response = WorkflowResponse(
-            workflow_id=result['workflow_id'],
-            session_id=result['session_id'],
-            status=result['status'],
-            immediate_response=immediate_response,
-            final_output=result['final_output'],
-            execution_history=result['execution_history'],
-            total_execution_time_ms=result['total_execution_time_ms'],
-            timestamp=result['timestamp']
-        )
+        # Execute workflow
+        result = await run_workflow(workflow, input_data, session_id=request.session_id)
+        
+        # Immediate response configured on the workflow's webhook node
+        immediate_response = result.get('immediate_response') or "Processing your request through our AI agents..."
         
         # Log metrics in background
-        background_tasks.add_task(
-            log_workflow_metrics,
+        enqueue_workflow_metrics(
             workflow_id=result['workflow_id'],
             execution_time=result['total_execution_time_ms']
         )
         
-        return response
+        return ORJSONResponse(content=format_workflow_response(result, immediate_response))
         
     except Exception as e:
         logger.error(f"Webhook execution failed: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/prompt-engineering", response_model=WorkflowResponse)
-async def prompt_engineering_endpoint(
-    request: WorkflowRequest,
-    background_tasks: BackgroundTasks
-):
+def format_workflow_response(result: Dict[str, Any], immediate_response: str) -> Dict[str, Any]:
+    """Shape an engine result like WorkflowResponse without re-validating it"""
+    return {
+        'workflow_id': result['workflow_id'],
+        'session_id': result['session_id'],
+        'status': result['status'],
+        'immediate_response': immediate_response,
+        'final_output': result['final_output'],
+        'execution_history': result['execution_history'],
+        'total_execution_time_ms': result['total_execution_time_ms'],
+        'timestamp': result['timestamp']
+    }
+
+async def run_prompt_engineering_workflow(request: WorkflowRequest) -> Dict[str, Any]:
+    """Execute the 3-agent prompt engineering workflow and format the response"""
+    # Force use of prompt engineering workflow
+    request.workflow_id = 'prompt_engineering'
+    
+    logger.debug("Executing prompt engineering workflow for session %s", request.session_id)
+    
+    # Get the prompt engineering workflow
+    workflow = compiled_store.get('prompt_engineering')
+    if not workflow:
+        raise HTTPException(
+            status_code=500, 
+            detail="Prompt engineering workflow not configured"
+        )
+    
+    # Execute workflow
+    result = await run_workflow(
+        workflow,
+        {
+            'message': request.message,
+            'metadata': {
+                **request.metadata,
+                'workflow_type': 'prompt_engineering',
+                'quality_standard': 'MAANG'
+            }
+        },
+        session_id=request.session_id
+    )
+    
+    # Specialized immediate response for prompt engineering
+    immediate_response = "Processing your prompt engineering request through our 3-agent MAANG-grade pipeline..."
+    
+    # Format response
+    response = format_workflow_response(result, immediate_response)
+    
+    # Log metrics
+    enqueue_workflow_metrics(
+        workflow_id=result['workflow_id'],
+        execution_time=result['total_execution_time_ms'],
+        workflow_type="prompt_engineering"
+    )
+    
+    return response
+
+@app.post("/prompt-engineering", responses={200: {"model": WorkflowResponse}})
+async def prompt_engineering_endpoint(request: WorkflowRequest):
     """
     Specialized endpoint for MAANG-grade prompt engineering workflow
     
@@ -381,62 +1039,58 @@ async def prompt_engineering_endpoint(
     3. Agent 3 (Template Polisher): Final polishing and standardization
     """
     try:
-        # Force use of prompt engineering workflow
-        request.workflow_id = 'prompt_engineering'
-        
-        logger.info(f"Executing prompt engineering workflow for session {request.session_id}")
-        
-        # Get the prompt engineering workflow
-        workflow = workflow_store.get('prompt_engineering')
-        if not workflow:
-            raise HTTPException(
-                status_code=500, 
-                detail="Prompt engineering workflow not configured"
-            )
-        
-        # Execute workflow
-        result = await workflow_engine.execute_workflow(
-            workflow,
-            {
-                'message': request.message,
-                'metadata': {
-                    **request.metadata,
-                    'workflow_type': 'prompt_engineering',
-                    'quality_standard': 'MAANG'
-                }
-            },
-            session_id=request.session_id
-        )
-        
-        # Specialized immediate response for prompt engineering
-        immediate_response = "Processing your prompt engineering request through our 3-agent MAANG-grade pipeline..."
-        
-        # Format response
-        response = WorkflowResponse(
-            workflow_id=result['workflow_id'],
-            session_id=result['session_id'], 
-            status=result['status'],
-            immediate_response=immediate_response,
-            final_output=result['final_output'],
-            execution_history=result['execution_history'],
-            total_execution_time_ms=result['total_execution_time_ms'],
-            timestamp=result['timestamp']
-        )
-        
-        # Log metrics
-        background_tasks.add_task(
-            log_workflow_metrics,
-            workflow_id=result['workflow_id'],
-            execution_time=result['total_execution_time_ms'],
-            workflow_type="prompt_engineering"
-        )
-        
-        return response
+        return ORJSONResponse(content=await run_prompt_engineering_workflow(request))
         
     except Exception as e:
         logger.error(f"Prompt engineering workflow failed: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _run_and_store(task_id: str, request: WorkflowRequest):
+    """Run the prompt engineering workflow and record its outcome in Redis"""
+    try:
+        response = await run_prompt_engineering_workflow(request)
+        await save_task(task_id, status="COMPLETED", result=response)
+    except Exception as e:
+        logger.error(f"Async prompt engineering task {task_id} failed: {str(e)}", exc_info=True)
+        await save_task(task_id, status="FAILED", error=str(e))
+
+@app.post("/prompt-engineering/async", status_code=202)
+async def prompt_engineering_async_endpoint(request: WorkflowRequest):
+    """
+    Start the prompt engineering workflow without waiting for it to finish
+    
+    Returns a task_id immediately; poll GET /tasks/{task_id} for the result.
+    Requires REDIS_URL so the result is visible to every worker.
+    """
+    if redis_client is None:
+        raise HTTPException(status_code=503, detail="Async tasks require REDIS_URL")
+    
+    task_id = str(uuid4())
+    await save_task(task_id, status="RUNNING", result=None, error=None)
+    
+    task = asyncio.create_task(_run_and_store(task_id, request))
+    running_tasks.add(task)
+    task.add_done_callback(running_tasks.discard)
+    
+    return {"task_id": task_id, "status": "RUNNING"}
+
+@app.get("/tasks/{task_id}")
+async def get_task(task_id: str):
+    """Get status and result of an async workflow task"""
+    if redis_client is None:
+        raise HTTPException(status_code=503, detail="Async tasks require REDIS_URL")
+    
+    task = await load_task(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    return {
+        "task_id": task_id,
+        "status": task["status"],
+        "result": task["result"],
+        "error": task["error"]
+    }
+
 @app.post("/workflows")
 async def create_workflow(workflow_def: WorkflowDefinitionRequest):
     """Create or update a workflow definition"""
@@ -465,7 +1119,7 @@ async def create_workflow(workflow_def: WorkflowDefinitionRequest):
         
         # Create workflow definition
         workflow = WorkflowDefinition(
-            workflow_id=str(len(workflow_store) + 1),  # Simple ID generation
+            workflow_id=str(ULID()),  # Unique across workers, sorts by creation time
             name=workflow_def.name,
             nodes=nodes,
             connections=connections,
@@ -473,7 +1127,7 @@ async def create_workflow(workflow_def: WorkflowDefinitionRequest):
         )
         
         # Store workflow
-        workflow_store[workflow.workflow_id] = workflow
+        await save_workflow(workflow)
         
         return {
             "workflow_id": workflow.workflow_id,
@@ -487,27 +1141,50 @@ async def create_workflow(workflow_def: WorkflowDefinitionRequest):
         logger.error(f"Workflow creation failed: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
 
+async def _load_or_rebuild_workflow_list() -> bytes:
+    """Return the cached workflow listing, rebuilding it after any mutation"""
+    global _workflow_list_cache, _workflow_list_version
+    
+    version = await redis_client.get("wf_version") if redis_client is not None else None
+    if _workflow_list_cache is not None and version == _workflow_list_version:
+        return _workflow_list_cache
+    
+    async with _workflow_list_lock:
+        if _workflow_list_cache is not None and version == _workflow_list_version:
+            return _workflow_list_cache
+        
+        # Built-ins keep registration order, then user workflows by ULID (creation time)
+        items = sorted(
+            (await load_all_workflows()).items(),
+            key=lambda item: (False, "") if item[0] in _builtin_workflow_keys else (True, item[0])
+        )
+        
+        workflows = []
+        for workflow_id, workflow in items:
+            if workflow_id != 'default':  # Skip the default alias
+                workflows.append({
+                    "workflow_id": workflow.workflow_id,
+                    "name": workflow.name,
+                    "node_count": len(workflow.nodes),
+                    "connection_count": len(workflow.connections)
+                })
+        
+        payload = orjson.dumps({"workflows": workflows, "count": len(workflows)})
+        _workflow_list_cache, _workflow_list_version = payload, version
+        return payload
+
 @app.get("/workflows")
 async def list_workflows():
     """List all available workflows"""
-    workflows = []
-    for workflow_id, workflow in workflow_store.items():
-        if workflow_id != 'default':  # Skip the default alias
-            workflows.append({
-                "workflow_id": workflow.workflow_id,
-                "name": workflow.name,
-                "node_count": len(workflow.nodes),
-                "connection_count": len(workflow.connections)
-            })
-    
-    return {"workflows": workflows, "count": len(workflows)}
+    return Response(content=await _load_or_rebuild_workflow_list(), media_type="application/json")
 
 @app.get("/workflows/{workflow_id}")
 async def get_workflow(workflow_id: str):
     """Get specific workflow definition"""
-    workflow = workflow_store.get(workflow_id)
-    if not workflow:
+    compiled = await lookup_workflow(workflow_id)
+    if not compiled:
         raise HTTPException(status_code=404, detail="Workflow not found")
+    workflow = compiled.definition
     
     return {
         "workflow_id": workflow.workflow_id,
@@ -540,10 +1217,9 @@ async def delete_workflow(workflow_id: str):
     if workflow_id == 'default':
         raise HTTPException(status_code=400, detail="Cannot delete default workflow")
     
-    if workflow_id not in workflow_store:
+    if not await delete_stored_workflow(workflow_id):
         raise HTTPException(status_code=404, detail="Workflow not found")
     
-    del workflow_store[workflow_id]
     return {"workflow_id": workflow_id, "status": "deleted"}
 
 @app.get("/health")
@@ -551,16 +1227,16 @@ async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
-        "timestamp": datetime.utcnow().isoformat(),
-        "workflow_count": len([k for k in workflow_store.keys() if k != 'default']),
-        "azure_configured": bool(Config.AZURE_OPENAI_ENDPOINT),
+        "timestamp": utc_now_iso(),
+        "workflow_count": len(workflow_store) - ('default' in workflow_store),
+        "azure_configured": bool(settings.azure_openai_endpoint),
+        "inflight_workflows": settings.max_inflight - EXEC_SEM._value,
+        "max_inflight_workflows": settings.max_inflight,
         "version": "2.0.0"
     }
 
-@app.get("/")
-async def root():
-    """Root endpoint with API documentation"""
-    return HTMLResponse(content="""
+# The landing page never changes, so encode it once at import time
+_ROOT_HTML: bytes = """
     <!DOCTYPE html>
     <html>
     <head>
@@ -580,7 +1256,7 @@ async def root():
         
         <div class="endpoint">
             <span class="method">POST</span> <code>/webhook</code><br>
-            Execute workflow with user input
+            Execute workflow with user input (send <code>Accept: text/event-stream</code> to stream node events)
         </div>
         
         <div class="endpoint">
@@ -588,6 +1264,16 @@ async def root():
             MAANG-grade prompt engineering workflow (3 agents)
         </div>
         
+        <div class="endpoint">
+            <span class="method">POST</span> <code>/prompt-engineering/async</code><br>
+            Start the prompt engineering workflow and return a task ID immediately
+        </div>
+        
+        <div class="endpoint">
+            <span class="method">GET</span> <code>/tasks/{task_id}</code><br>
+            Poll status and result of an async workflow task
+        </div>
+        
         <div class="endpoint">
             <span class="method">GET</span> <code>/workflows</code><br>
             List all available workflows
@@ -647,27 +1333,39 @@ curl -X POST "http://localhost:8000/prompt-engineering" \\
         </ul>
     </body>
     </html>
-    """)
+    """.encode("utf-8")
+
+@app.get("/")
+async def root():
+    """Root endpoint with API documentation"""
+    return Response(
+        content=_ROOT_HTML,
+        media_type="text/html",
+        headers={"cache-control": "public, max-age=3600"}
+    )
 
 async def log_workflow_metrics(workflow_id: str, execution_time: float, workflow_type: str = "general"):
-    """Background task for logging workflow metrics"""
+    """Flush a single workflow's metrics (called by the metrics workers)"""
     logger.info(f"Workflow {workflow_id} ({workflow_type}) metrics - Execution time: {execution_time}ms")
 
+# Coroutines each metrics batch is fanned out to; append new sinks here
+metrics_sinks: List[Callable[..., Awaitable[None]]] = [log_workflow_metrics]
+
 # Example test function
 @app.post("/test")
 async def test_workflow():
     """Test endpoint for quick workflow verification"""
-    test_request = WorkflowRequest(
-        message="Test message for multi-agent workflow",
-        session_id="test_session"
-    )
-    
     try:
-        response = await webhook_endpoint(test_request, BackgroundTasks())
+        # Run the engine directly rather than re-entering the webhook endpoint
+        result = await run_workflow(
+            compiled_store['default'],
+            {'message': "Test message for multi-agent workflow", 'metadata': {}},
+            session_id="test_session"
+        )
         return {
             "test_status": "success",
-            "response_preview": str(response.final_output)[:200] + "..." if response.final_output else "No output",
-            "execution_time_ms": response.total_execution_time_ms
+            "response_preview": str(result['final_output'])[:200] + "..." if result['final_output'] else "No output",
+            "execution_time_ms": result['total_execution_time_ms']
         }
     except Exception as e:
         return {
@@ -676,10 +1374,23 @@ async def test_workflow():
         }
 
 if __name__ == "__main__":
+    # Without REDIS_URL each worker keeps its own workflow_store, so workflows
+    # created through /workflows are only visible to the worker that handled
+    # the request, session memory does not outlive a single execution, and the
+    # async /prompt-engineering/async + /tasks endpoints answer 503.
+    # uvicorn speaks HTTP/1.1 only; terminate TLS + HTTP/2 at a proxy (nginx
+    # `http2 on`) or run `hypercorn main_enhanced:app --worker-class uvloop`
+    # and set ALT_SVC to advertise it.
     uvicorn.run(
         "main_enhanced:app",
         host="0.0.0.0", 
         port=8000,
-        reload=True,
+        # WEB_CONCURRENCY is the conventional knob; ~2x CPU count suits this I/O-bound app
+        workers=int(os.getenv("WEB_CONCURRENCY") or os.getenv("WORKERS") or 2 * (os.cpu_count() or 1)),
+        loop="uvloop",
+        http="httptools",
+        reload=False,
+        timeout_keep_alive=settings.keep_alive_timeout,
+        h11_max_incomplete_event_size=16384,
         log_level="info"
     )
\ No newline at end of file
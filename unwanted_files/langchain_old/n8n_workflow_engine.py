@@ -3,25 +3,72 @@ N8N-Style Workflow Engine for LangChain Multi-Agent Systems
 Dynamic workflow configuration and execution engine
 """
 
+from __future__ import annotations
+
 import asyncio
+import graphlib
+import heapq
+import itertools
 import json
-from typing import Dict, Any, List, Optional, Union
-from dataclasses import dataclass, field
-from enum import Enum
-from pydantic import BaseModel
+import os
+import sys
+import hashlib
+import aiohttp
+import httpx
+import orjson
+from collections import deque, OrderedDict
+from typing import Dict, Any, List, Optional, Union, Tuple, Mapping, Sequence, AsyncIterator, final, TYPE_CHECKING
+from dataclasses import dataclass, field, asdict
+from enum import Enum, IntEnum
+from types import MappingProxyType, SimpleNamespace
+from functools import lru_cache
+from pydantic import BaseModel, ConfigDict, ValidationError
 import logging
-from datetime import datetime
+from datetime import datetime, timezone
 import uuid
+from time import perf_counter_ns, time_ns
 
-from langchain_openai import AzureChatOpenAI
-from langchain.agents import AgentExecutor, create_openai_tools_agent
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.tools import Tool
-from langchain_core.runnables.history import RunnableWithMessageHistory
-from langchain_community.chat_message_histories import ChatMessageHistory
+if TYPE_CHECKING:
+    from langchain_openai import AzureChatOpenAI
+    from langchain.agents import AgentExecutor
+    from langchain_core.tools import Tool
+    from langchain_core.runnables.history import RunnableWithMessageHistory
 
 logger = logging.getLogger(__name__)
 
+@lru_cache(maxsize=1)
+def _lc() -> SimpleNamespace:
+    """Import LangChain on first use so workflows without AI agent nodes never load it"""
+    from langchain_openai import AzureChatOpenAI
+    from langchain.agents import AgentExecutor, create_openai_tools_agent
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+    from langchain_core.tools import Tool
+    from langchain_core.runnables.history import RunnableWithMessageHistory
+    from langchain_community.chat_message_histories import ChatMessageHistory
+    from langchain_core.messages import BaseMessage
+    
+    class AppendOnlyWindowHistory(ChatMessageHistory):
+        """In-memory history that only appends until reset_at, then jumps back to the last min_keep messages"""
+        min_keep: int = 10
+        reset_at: int = 20
+        
+        def add_message(self, message: BaseMessage) -> None:
+            """Append a message, truncating in one step so the prompt prefix stays stable between resets"""
+            self.messages.append(message)
+            if len(self.messages) >= self.reset_at:
+                self.messages = self.messages[-self.min_keep:]
+    
+    return SimpleNamespace(
+        AzureChatOpenAI=AzureChatOpenAI,
+        AgentExecutor=AgentExecutor,
+        create_openai_tools_agent=create_openai_tools_agent,
+        ChatPromptTemplate=ChatPromptTemplate,
+        MessagesPlaceholder=MessagesPlaceholder,
+        Tool=Tool,
+        RunnableWithMessageHistory=RunnableWithMessageHistory,
+        AppendOnlyWindowHistory=AppendOnlyWindowHistory
+    )
+
 class NodeType(str, Enum):
     """Available node types in the workflow"""
     WEBHOOK = "webhook"
@@ -41,15 +88,25 @@ class NodeStatus(str, Enum):
     FAILED = "failed"
     SKIPPED = "skipped"
 
-@dataclass
+# Integer twin of NodeStatus for the scheduler's hot comparisons; the string
+# enum remains the public and serialized form
+_NodeStatusInt = IntEnum('_NodeStatusInt', [status.name for status in NodeStatus])
+_STATUS_INT = {status: _NodeStatusInt[status.name] for status in NodeStatus}
+
+@dataclass(slots=True)
 class Connection:
     """Represents a connection between workflow nodes"""
     source_node: str
     target_node: str
     condition: Optional[str] = None  # For conditional routing
     output_key: Optional[str] = None  # Which output to pass
+    
+    def __post_init__(self):
+        # Node ids are compared and hashed on every traversal step
+        self.source_node = sys.intern(self.source_node)
+        self.target_node = sys.intern(self.target_node)
 
-@dataclass
+@dataclass(slots=True)
 class NodeConfig:
     """Configuration for a workflow node"""
     node_id: str
@@ -57,18 +114,125 @@ class NodeConfig:
     name: str
     config: Dict[str, Any] = field(default_factory=dict)
     position: Dict[str, int] = field(default_factory=dict)  # For UI positioning
+    
+    def __post_init__(self):
+        self.node_id = sys.intern(self.node_id)
+        if isinstance(self.config.get('source_node'), str):
+            self.config['source_node'] = sys.intern(self.config['source_node'])
 
-@dataclass
+@dataclass(slots=True)
 class WorkflowDefinition:
     """Complete workflow definition matching n8n structure"""
     workflow_id: str
     name: str
-    nodes: List[NodeConfig]
-    connections: List[Connection]
+    nodes: Sequence[NodeConfig]
+    connections: Sequence[Connection]
     settings: Dict[str, Any] = field(default_factory=dict)
+    
+    def __post_init__(self):
+        # Definitions reloaded or re-created with the same prompts share one string object
+        for node in self.nodes:
+            if node.node_type == NodeType.AI_AGENT and isinstance(node.config.get('prompt'), str):
+                node.config['prompt'] = sys.intern(node.config['prompt'])
+
+@dataclass(frozen=True, slots=True)
+class CompiledWorkflow:
+    """Read-only workflow with its topology precomputed for execution"""
+    definition: WorkflowDefinition
+    node_by_id: Mapping[str, NodeConfig]
+    successors: Mapping[str, Tuple[Connection, ...]]
+    predecessors: Mapping[str, Tuple[Connection, ...]]
+    entry_node_id: str
+    topo_order: Tuple[str, ...]
+    topo_index: Mapping[str, int]  # Position of each node in topo_order
+    # Scheduler tables over int indices (definition order) instead of node-id strings
+    node_ids: Tuple[str, ...]  # Index -> node_id
+    entry_index: int
+    dependencies: Mapping[int, Tuple[int, ...]]  # Index -> predecessor indices, for TopologicalSorter
+    topo_rank: Tuple[int, ...]  # Index -> position in topo_order
+    fingerprint: str  # Content hash of the definition, used as the plan cache key
+    
+    @property
+    def workflow_id(self) -> str:
+        return self.definition.workflow_id
+    
+    @property
+    def name(self) -> str:
+        return self.definition.name
+
+def workflow_fingerprint(workflow_def: WorkflowDefinition) -> str:
+    """Stable content hash of a workflow's nodes, connections and settings"""
+    payload = orjson.dumps(
+        asdict(workflow_def),
+        option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS,
+        default=str
+    )
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+def compile_workflow(workflow_def: WorkflowDefinition) -> CompiledWorkflow:
+    """Build adjacency maps and a topological order for a workflow definition"""
+    node_by_id = {node.node_id: node for node in workflow_def.nodes}
+    if len(node_by_id) != len(workflow_def.nodes):
+        raise ValueError(f"Workflow {workflow_def.name} has duplicate node ids")
+    
+    entry_nodes = [node for node in workflow_def.nodes if node.node_type == NodeType.WEBHOOK]
+    if not entry_nodes:
+        raise ValueError("Workflow must have a webhook entry point")
+    
+    successors: Dict[str, List[Connection]] = {node_id: [] for node_id in node_by_id}
+    predecessors: Dict[str, List[Connection]] = {node_id: [] for node_id in node_by_id}
+    for conn in workflow_def.connections:
+        if conn.source_node not in node_by_id or conn.target_node not in node_by_id:
+            raise ValueError(f"Connection {conn.source_node} -> {conn.target_node} references an unknown node")
+        successors[conn.source_node].append(conn)
+        predecessors[conn.target_node].append(conn)
+    
+    # Remap node ids to contiguous ints so scheduling never hashes strings
+    node_ids = tuple(node_by_id)
+    index_of = {node_id: i for i, node_id in enumerate(node_ids)}
+    dependencies = {
+        index_of[node_id]: tuple(dict.fromkeys(index_of[c.source_node] for c in conns))
+        for node_id, conns in predecessors.items()
+    }
+    
+    try:
+        topo_order = tuple(node_ids[i] for i in graphlib.TopologicalSorter(dependencies).static_order())
+    except graphlib.CycleError as e:
+        raise ValueError(f"Workflow {workflow_def.name} contains a cycle") from e
+    topo_index = {node_id: i for i, node_id in enumerate(topo_order)}
+    
+    # Surface bad code and agent configs at load time rather than mid-run
+    for node in workflow_def.nodes:
+        if node.node_type == NodeType.CODE and node.config.get('language', 'javascript') != 'javascript':
+            try:
+                _compile_python(node.config.get('code', ''), node.node_id)
+            except SyntaxError as e:
+                raise ValueError(f"Code node {node.node_id} has invalid Python: {e}") from e
+        elif node.node_type == NodeType.AI_AGENT:
+            try:
+                _AgentCfg.from_config(node.config)
+            except ValidationError as e:
+                raise ValueError(f"AI agent node {node.node_id} has an invalid config: {e}") from e
+    
+    return CompiledWorkflow(
+        definition=workflow_def,
+        node_by_id=MappingProxyType(node_by_id),
+        successors=MappingProxyType({k: tuple(v) for k, v in successors.items()}),
+        predecessors=MappingProxyType({k: tuple(v) for k, v in predecessors.items()}),
+        entry_node_id=entry_nodes[0].node_id,
+        topo_order=topo_order,
+        topo_index=MappingProxyType(topo_index),
+        node_ids=node_ids,
+        entry_index=index_of[entry_nodes[0].node_id],
+        dependencies=MappingProxyType(dependencies),
+        topo_rank=tuple(topo_index[node_id] for node_id in node_ids),
+        fingerprint=workflow_fingerprint(workflow_def)
+    )
 
 class NodeExecutionResult:
     """Result of executing a single node"""
+    __slots__ = ('node_id', 'status', 'status_int', 'output', 'error', 'execution_time_ms', 'ts_ns')
+    
     def __init__(
         self, 
         node_id: str, 
@@ -79,20 +243,39 @@ class NodeExecutionResult:
     ):
         self.node_id = node_id
         self.status = status
+        self.status_int = _STATUS_INT[status]
         self.output = output
         self.error = error
         self.execution_time_ms = execution_time_ms
-        self.timestamp = datetime.utcnow()
+        self.ts_ns = time_ns()  # Wall clock; converted to a datetime only when read
+    
+    @property
+    def timestamp(self) -> datetime:
+        return datetime.fromtimestamp(self.ts_ns / 1e9, timezone.utc)
 
 class WorkflowContext:
     """Context maintained throughout workflow execution"""
-    def __init__(self, workflow_id: str, session_id: str = None):
+    __slots__ = ('workflow_id', 'session_id', 'data', 'node_outputs', 'execution_history', '_history_factory', '_memory_store')
+    
+    def __init__(self, workflow_id: str, session_id: str = None, history_factory=None):
         self.workflow_id = workflow_id
         self.session_id = session_id or str(uuid.uuid4())
         self.data: Dict[str, Any] = {}
         self.node_outputs: Dict[str, Any] = {}
         self.execution_history: List[NodeExecutionResult] = []
-        self.memory_store = ChatMessageHistory()
+        # Only caller-supplied sessions are worth persisting
+        self._history_factory = history_factory if session_id else None
+        self._memory_store = None
+    
+    @property
+    def memory_store(self):
+        """Chat history for this run, created when an agent first needs it"""
+        if self._memory_store is None:
+            if self._history_factory:
+                self._memory_store = self._history_factory(self.session_id)
+            else:
+                self._memory_store = _lc().AppendOnlyWindowHistory()
+        return self._memory_store
     
     def set_node_output(self, node_id: str, output: Any):
         """Store output from a node"""
@@ -106,8 +289,12 @@ class WorkflowContext:
         """Add execution result to history"""
         self.execution_history.append(result)
 
+class NodeSkipped(Exception):
+    """Raised from a node's _run when it has nothing to do; the node is marked SKIPPED"""
+
 class BaseNode:
     """Base class for all workflow nodes"""
+    __slots__ = ('config', 'node_id', 'node_type', 'name')
     
     def __init__(self, config: NodeConfig):
         self.config = config
@@ -115,8 +302,35 @@ class BaseNode:
         self.node_type = config.node_type
         self.name = config.name
     
+    @final
     async def execute(self, context: WorkflowContext, input_data: Any = None) -> NodeExecutionResult:
-        """Execute the node - to be implemented by subclasses"""
+        """Run the node, timing it and boxing any error into a failed result"""
+        t0 = perf_counter_ns()
+        try:
+            output = await self._run(context, input_data)
+        except NodeSkipped as e:
+            logger.info(f"Node {self.node_id} skipped: {e}")
+            return NodeExecutionResult(
+                node_id=self.node_id,
+                status=NodeStatus.SKIPPED,
+                execution_time_ms=(perf_counter_ns() - t0) / 1_000_000
+            )
+        except Exception as e:
+            return NodeExecutionResult(
+                node_id=self.node_id,
+                status=NodeStatus.FAILED,
+                error=str(e),
+                execution_time_ms=(perf_counter_ns() - t0) / 1_000_000
+            )
+        return NodeExecutionResult(
+            node_id=self.node_id,
+            status=NodeStatus.COMPLETED,
+            output=output,
+            execution_time_ms=(perf_counter_ns() - t0) / 1_000_000
+        )
+    
+    async def _run(self, context: WorkflowContext, input_data: Any) -> Any:
+        """Produce the node's output - to be implemented by subclasses"""
         raise NotImplementedError
     
     def validate_config(self) -> bool:
@@ -125,77 +339,54 @@ class BaseNode:
 
 class WebhookNode(BaseNode):
     """Webhook trigger node"""
+    __slots__ = ()
     
-    async def execute(self, context: WorkflowContext, input_data: Any = None) -> NodeExecutionResult:
-        start_time = datetime.utcnow()
+    async def _run(self, context: WorkflowContext, input_data: Any) -> Any:
+        # Process webhook input
+        webhook_data = input_data or {}
         
-        try:
-            # Process webhook input
-            webhook_data = input_data or {}
-            
-            # Store in context
-            context.data['webhook_input'] = webhook_data
-            
-            # Immediate response configuration
-            immediate_response = self.config.config.get('immediate_response', 'Request received')
-            
-            execution_time = (datetime.utcnow() - start_time).total_seconds() * 1000
-            
-            return NodeExecutionResult(
-                node_id=self.node_id,
-                status=NodeStatus.COMPLETED,
-                output={
-                    'immediate_response': immediate_response,
-                    'webhook_data': webhook_data
-                },
-                execution_time_ms=execution_time
-            )
+        # Store in context
+        context.data['webhook_input'] = webhook_data
         
-        except Exception as e:
-            execution_time = (datetime.utcnow() - start_time).total_seconds() * 1000
-            return NodeExecutionResult(
-                node_id=self.node_id,
-                status=NodeStatus.FAILED,
-                error=str(e),
-                execution_time_ms=execution_time
-            )
+        # Immediate response configuration
+        immediate_response = self.config.config.get('immediate_response', 'Request received')
+        context.data['immediate_response'] = immediate_response
+        
+        return {
+            'immediate_response': immediate_response,
+            'webhook_data': webhook_data
+        }
+
+@lru_cache(maxsize=256)
+def _compile_python(code: str, node_id: str):
+    """Compile a code node's Python source once; raises SyntaxError on bad code"""
+    return compile(code, f'<codenode:{node_id}>', 'exec')
 
 class CodeNode(BaseNode):
     """JavaScript/Python code execution node"""
+    __slots__ = ('_compiled_py',)
     
-    async def execute(self, context: WorkflowContext, input_data: Any = None) -> NodeExecutionResult:
-        start_time = datetime.utcnow()
+    def __init__(self, config: NodeConfig):
+        super().__init__(config)
+        if config.config.get('language', 'javascript') == 'javascript':
+            self._compiled_py = None
+        else:
+            self._compiled_py = _compile_python(config.config.get('code', ''), self.node_id)
+    
+    async def _run(self, context: WorkflowContext, input_data: Any) -> Any:
+        # Get code from configuration
+        code = self.config.config.get('code', '')
+        language = self.config.config.get('language', 'javascript')
         
-        try:
-            # Get code from configuration
-            code = self.config.config.get('code', '')
-            language = self.config.config.get('language', 'javascript')
-            
-            if language == 'javascript':
-                # Simulate JavaScript execution
-                # In production, you'd use a proper JS engine like PyMiniRacer
-                result = self._simulate_js_execution(code, input_data, context)
-            else:
-                # Execute Python code (be careful with security!)
-                result = self._execute_python_code(code, input_data, context)
-            
-            execution_time = (datetime.utcnow() - start_time).total_seconds() * 1000
-            
-            return NodeExecutionResult(
-                node_id=self.node_id,
-                status=NodeStatus.COMPLETED,
-                output=result,
-                execution_time_ms=execution_time
-            )
+        if language == 'javascript':
+            # Simulate JavaScript execution
+            # In production, you'd use a proper JS engine like PyMiniRacer
+            result = self._simulate_js_execution(code, input_data, context)
+        else:
+            # Execute Python code (be careful with security!)
+            result = self._execute_python_code(input_data, context)
         
-        except Exception as e:
-            execution_time = (datetime.utcnow() - start_time).total_seconds() * 1000
-            return NodeExecutionResult(
-                node_id=self.node_id,
-                status=NodeStatus.FAILED,
-                error=str(e),
-                execution_time_ms=execution_time
-            )
+        return result
     
     def _simulate_js_execution(self, code: str, input_data: Any, context: WorkflowContext) -> Dict[str, Any]:
         """Simulate JavaScript execution"""
@@ -206,7 +397,7 @@ class CodeNode(BaseNode):
             'code_executed': code[:100] + "..." if len(code) > 100 else code
         }
     
-    def _execute_python_code(self, code: str, input_data: Any, context: WorkflowContext) -> Dict[str, Any]:
+    def _execute_python_code(self, input_data: Any, context: WorkflowContext) -> Dict[str, Any]:
         """Execute Python code safely (restricted environment)"""
         # WARNING: This is unsafe for production without proper sandboxing
         safe_globals = {
@@ -217,113 +408,79 @@ class CodeNode(BaseNode):
         }
         
         local_vars = {}
-        exec(code, safe_globals, local_vars)
+        exec(self._compiled_py, safe_globals, local_vars)
         
         return local_vars.get('result', local_vars)
 
+class _AgentCfg(BaseModel):
+    """Validated AI agent node configuration, with the nested model settings flattened in"""
+    model_config = ConfigDict(frozen=True)
+    
+    deployment: str = 'gpt-4'
+    temperature: float = 0.7
+    max_tokens: int = 1000
+    prompt: str = ''
+    memory: bool = True
+    tools: List[Dict[str, Any]] = []
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> _AgentCfg:
+        return cls.model_validate({**config, **config.get('model', {})})
+
 class AIAgentNode(BaseNode):
     """AI Agent execution node with Azure OpenAI"""
+    __slots__ = ('llm_factory', 'executor_cache', '_cfg', '_model_key', '_tools_key')
     
-    def __init__(self, config: NodeConfig, llm_factory=None):
+    def __init__(self, config: NodeConfig, llm_factory=None, executor_cache: Optional[OrderedDict] = None):
         super().__init__(config)
         self.llm_factory = llm_factory
+        # Owned by the engine so executors (and the LLM clients in them) go away on aclose()
+        self.executor_cache = executor_cache
+        self._cfg = _AgentCfg.from_config(config.config)
+        # Executor cache keys; the raw model dict is what llm_factory receives
+        self._model_key = json.dumps(config.config.get('model', {}), sort_keys=True, default=str)
+        self._tools_key = json.dumps(self._cfg.tools, sort_keys=True, default=str)
     
-    async def execute(self, context: WorkflowContext, input_data: Any = None) -> NodeExecutionResult:
-        start_time = datetime.utcnow()
+    async def _run(self, context: WorkflowContext, input_data: Any) -> Any:
+        memory_enabled = self._cfg.memory
         
-        try:
-            # Get agent configuration
-            agent_config = self.config.config
-            model_config = agent_config.get('model', {})
-            prompt_template = agent_config.get('prompt', '')
-            memory_enabled = agent_config.get('memory', True)
-            
-            # Create LLM
-            llm = self._create_llm(model_config)
-            
-            # Create agent
-            agent = self._create_agent(llm, prompt_template, memory_enabled, context)
-            
-            # Prepare input
-            agent_input = self._prepare_agent_input(input_data, context)
-            
-            # Execute agent
-            response = await agent.ainvoke(
-                {"input": agent_input},
-                config={"configurable": {"session_id": context.session_id}} if memory_enabled else {}
-            )
-            
-            output = response.get("output", "")
-            
-            execution_time = (datetime.utcnow() - start_time).total_seconds() * 1000
-            
-            return NodeExecutionResult(
-                node_id=self.node_id,
-                status=NodeStatus.COMPLETED,
-                output={
-                    'agent_response': output,
-                    'model_used': model_config.get('deployment', 'gpt-4'),
-                    'memory_enabled': memory_enabled
-                },
-                execution_time_ms=execution_time
-            )
+        # Create agent (executor is reused across executions with the same config)
+        agent = self._create_agent(context)
         
-        except Exception as e:
-            execution_time = (datetime.utcnow() - start_time).total_seconds() * 1000
-            return NodeExecutionResult(
-                node_id=self.node_id,
-                status=NodeStatus.FAILED,
-                error=str(e),
-                execution_time_ms=execution_time
-            )
-    
-    def _create_llm(self, model_config: Dict[str, Any]) -> AzureChatOpenAI:
-        """Create Azure OpenAI LLM instance"""
-        if self.llm_factory:
-            return self.llm_factory(model_config)
+        # Prepare input
+        agent_input = self._prepare_agent_input(input_data, context)
         
-        # Default LLM creation
-        return AzureChatOpenAI(
-            azure_deployment=model_config.get('deployment', 'gpt-4'),
-            temperature=model_config.get('temperature', 0.7),
-            max_tokens=model_config.get('max_tokens', 1000),
-            timeout=30,
-            max_retries=3
+        # Execute agent
+        response = await agent.ainvoke(
+            {"input": agent_input},
+            config={"configurable": {"session_id": context.session_id}} if memory_enabled else {}
         )
-    
-    def _create_agent(
-        self, 
-        llm: AzureChatOpenAI, 
-        prompt_template: str, 
-        memory_enabled: bool,
-        context: WorkflowContext
-    ) -> Union[AgentExecutor, RunnableWithMessageHistory]:
-        """Create configured agent"""
-        
-        # Create tools based on configuration
-        tools = self._create_tools()
         
-        # Create prompt
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", prompt_template or "You are a helpful AI assistant."),
-            MessagesPlaceholder(variable_name="chat_history") if memory_enabled else ("human", ""),
-            ("human", "{input}"),
-            MessagesPlaceholder(variable_name="agent_scratchpad")
-        ])
+        output = response.get("output", "")
         
-        # Create agent
-        agent = create_openai_tools_agent(llm, tools, prompt)
-        agent_executor = AgentExecutor(
-            agent=agent,
-            tools=tools,
-            verbose=True,
-            handle_parsing_errors=True,
-            max_iterations=3
-        )
+        return {
+            'agent_response': output,
+            'model_used': self._cfg.deployment,
+            'memory_enabled': memory_enabled
+        }
+    
+    def _create_agent(self, context: WorkflowContext) -> Union[AgentExecutor, RunnableWithMessageHistory]:
+        """Create configured agent"""
+        key = (self._model_key, self._cfg.prompt, self._tools_key, self._cfg.memory)
+        cache = self.executor_cache
+        agent_executor = cache.get(key) if cache is not None else None
+        if agent_executor is None:
+            agent_executor = _build_agent_executor(self.llm_factory, *key)
+            if cache is not None:
+                cache[key] = agent_executor
+                if len(cache) > EXECUTOR_CACHE_SIZE:
+                    cache.popitem(last=False)
+        else:
+            cache.move_to_end(key)
         
-        if memory_enabled:
-            # Wrap with memory
-            return RunnableWithMessageHistory(
+        if self._cfg.memory:
+            # Wrap with memory; the history belongs to this execution's context
+            return _lc().RunnableWithMessageHistory(
                 agent_executor,
                 lambda session_id: context.memory_store,
                 input_messages_key="input",
@@ -332,21 +489,6 @@ class AIAgentNode(BaseNode):
         
         return agent_executor
     
-    def _create_tools(self) -> List[Tool]:
-        """Create tools for the agent"""
-        tools = []
-        tool_configs = self.config.config.get('tools', [])
-        
-        for tool_config in tool_configs:
-            tool = Tool(
-                name=tool_config.get('name', 'generic_tool'),
-                func=lambda x: f"Tool executed: {x}",  # Placeholder
-                description=tool_config.get('description', 'Generic tool')
-            )
-            tools.append(tool)
-        
-        return tools
-    
     def _prepare_agent_input(self, input_data: Any, context: WorkflowContext) -> str:
         """Prepare input for the agent"""
         if isinstance(input_data, dict):
@@ -355,66 +497,118 @@ class AIAgentNode(BaseNode):
             elif 'input' in input_data:
                 return input_data['input']
             else:
-                return json.dumps(input_data)
+                return orjson.dumps(input_data, option=orjson.OPT_NON_STR_KEYS).decode()
         elif isinstance(input_data, str):
             return input_data
         else:
             return str(input_data)
 
+def _create_llm(llm_factory, model_config: Dict[str, Any]) -> AzureChatOpenAI:
+    """Create Azure OpenAI LLM instance"""
+    if llm_factory:
+        return llm_factory(model_config)
+    
+    # Default LLM creation
+    return _lc().AzureChatOpenAI(
+        azure_deployment=model_config.get('deployment', 'gpt-4'),
+        temperature=model_config.get('temperature', 0.7),
+        max_tokens=model_config.get('max_tokens', 1000),
+        timeout=30,
+        max_retries=3
+    )
+
+def _create_tools(tool_configs: List[Dict[str, Any]]) -> List[Tool]:
+    """Create tools for the agent"""
+    tools = []
+    
+    for tool_config in tool_configs:
+        tool = _lc().Tool(
+            name=tool_config.get('name', 'generic_tool'),
+            func=lambda x: f"Tool executed: {x}",  # Placeholder
+            description=tool_config.get('description', 'Generic tool')
+        )
+        tools.append(tool)
+    
+    return tools
+
+# Per-engine cap on reusable AgentExecutors (LRU)
+EXECUTOR_CACHE_SIZE = 128
+
+def _build_agent_executor(
+    llm_factory,
+    model_key: str,
+    prompt_template: str,
+    tools_key: str,
+    memory_enabled: bool
+) -> AgentExecutor:
+    """Build an AgentExecutor; reusable because nothing in it is execution-specific"""
+    lc = _lc()
+    llm = _create_llm(llm_factory, json.loads(model_key))
+    tools = _create_tools(json.loads(tools_key))
+    
+    # Create prompt
+    prompt = lc.ChatPromptTemplate.from_messages([
+        ("system", prompt_template or "You are a helpful AI assistant."),
+        lc.MessagesPlaceholder(variable_name="chat_history") if memory_enabled else ("human", ""),
+        ("human", "{input}"),
+        lc.MessagesPlaceholder(variable_name="agent_scratchpad")
+    ])
+    
+    # Create agent
+    agent = lc.create_openai_tools_agent(llm, tools, prompt)
+    return lc.AgentExecutor(
+        agent=agent,
+        tools=tools,
+        verbose=True,
+        handle_parsing_errors=True,
+        max_iterations=3
+    )
+
+@lru_cache(maxsize=1024)
+def _split_path(path: str) -> Tuple[str, ...]:
+    """Split a dot-notation path once; mappings repeat across executions"""
+    return tuple(path.split('.'))
+
 class OutputPassNode(BaseNode):
     """Node that passes output from one agent to another"""
+    __slots__ = ('_compiled_mapping',)
     
-    async def execute(self, context: WorkflowContext, input_data: Any = None) -> NodeExecutionResult:
-        start_time = datetime.utcnow()
+    def __init__(self, config: NodeConfig):
+        super().__init__(config)
+        # Pre-split mapping paths so execute only walks them
+        self._compiled_mapping = tuple(
+            (target_key, _split_path(source_path))
+            for target_key, source_path in config.config.get('output_mapping', {}).items()
+        )
+    
+    async def _run(self, context: WorkflowContext, input_data: Any) -> Any:
+        # Get configuration
+        source_node = self.config.config.get('source_node')
         
-        try:
-            # Get configuration
-            source_node = self.config.config.get('source_node')
-            output_mapping = self.config.config.get('output_mapping', {})
-            
-            # Get source data
-            if source_node:
-                source_output = context.get_node_output(source_node)
-            else:
-                source_output = input_data
-            
-            # Apply transformations
-            transformed_output = self._transform_output(source_output, output_mapping)
-            
-            execution_time = (datetime.utcnow() - start_time).total_seconds() * 1000
-            
-            return NodeExecutionResult(
-                node_id=self.node_id,
-                status=NodeStatus.COMPLETED,
-                output=transformed_output,
-                execution_time_ms=execution_time
-            )
+        # Get source data
+        if source_node:
+            source_output = context.get_node_output(source_node)
+        else:
+            source_output = input_data
         
-        except Exception as e:
-            execution_time = (datetime.utcnow() - start_time).total_seconds() * 1000
-            return NodeExecutionResult(
-                node_id=self.node_id,
-                status=NodeStatus.FAILED,
-                error=str(e),
-                execution_time_ms=execution_time
-            )
+        # Apply transformations
+        transformed_output = self._transform_output(source_output)
+        
+        return transformed_output
     
-    def _transform_output(self, output: Any, mapping: Dict[str, str]) -> Dict[str, Any]:
+    def _transform_output(self, output: Any) -> Dict[str, Any]:
         """Transform output according to mapping rules"""
-        if not mapping:
+        if not self._compiled_mapping:
             return output
         
-        transformed = {}
-        for target_key, source_path in mapping.items():
-            # Simple path resolution (e.g., "response.content")
-            value = self._resolve_path(output, source_path)
-            transformed[target_key] = value
-        
-        return transformed
+        # Simple path resolution (e.g., "response.content")
+        return {
+            target_key: self._resolve_path(output, parts)
+            for target_key, parts in self._compiled_mapping
+        }
     
-    def _resolve_path(self, data: Any, path: str) -> Any:
-        """Resolve a dot-notation path in data"""
-        parts = path.split('.')
+    def _resolve_path(self, data: Any, parts: Tuple[str, ...]) -> Any:
+        """Resolve a pre-split dot-notation path in data"""
         current = data
         
         for part in parts:
@@ -427,78 +621,302 @@ class OutputPassNode(BaseNode):
         
         return current
 
+class HTTPRequestNode(BaseNode):
+    """Sends its input to config['url'] (or the env var named by config['url_env']) and passes it through"""
+    __slots__ = ('session_factory',)
+    
+    def __init__(self, config: NodeConfig, session_factory):
+        super().__init__(config)
+        self.session_factory = session_factory
+    
+    async def _run(self, context: WorkflowContext, input_data: Any) -> Any:
+        request_config = self.config.config
+        url = request_config.get('url') or os.getenv(request_config.get('url_env', ''), '')
+        if not url:
+            raise NodeSkipped(f"no URL configured (set {request_config.get('url_env', 'url')})")
+        session = self.session_factory()
+        
+        async with session.request(
+            request_config.get('method', 'POST'),
+            url,
+            data=json.dumps(input_data, default=str),
+            headers=request_config.get('headers', {'Content-Type': 'application/json'}),
+            timeout=aiohttp.ClientTimeout(total=request_config.get('timeout', 10))
+        ) as response:
+            response.raise_for_status()
+            context.data.setdefault('http_responses', {})[self.node_id] = response.status
+        
+        return input_data
+
+class PriorityGate:
+    """Caps concurrently running nodes, admitting waiters with the lowest priority value first"""
+    
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()  # FIFO among equal priorities
+    
+    async def acquire(self, priority: int = 0):
+        if self._active < self.limit and not self._waiters:
+            self._active += 1
+            return
+        
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # A slot handed over just before cancellation must be passed on
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+    
+    def release(self):
+        # Hand the slot straight to the most urgent live waiter
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+
+@dataclass(frozen=True, slots=True)
+class CompiledPlan:
+    """A compiled workflow plus node instances that are reused across runs"""
+    compiled: CompiledWorkflow
+    nodes: Mapping[str, BaseNode]
+
 class WorkflowEngine:
     """Main workflow execution engine"""
     
-    def __init__(self, llm_factory=None):
-        self.llm_factory = llm_factory
+    def __init__(
+        self,
+        llm_factory=None,
+        history_factory=None,
+        plan_cache_size: int = 64,
+        max_concurrency: int = 0
+    ):
+        # Without a caller-supplied factory, LLMs are cached on the engine and share one pool
+        self.llm_factory = llm_factory or self._default_llm
+        self.history_factory = history_factory
+        self._llm_cache: Dict[Tuple[str, float, int], AzureChatOpenAI] = {}
+        self._httpx_client: Optional[httpx.AsyncClient] = None
+        # AgentExecutors keyed by agent config; they hold LLMs from llm_factory, so they live and die with the engine
+        self._executor_cache: OrderedDict[tuple, AgentExecutor] = OrderedDict()
+        # Compiled workflows with their node instances, keyed by fingerprint (LRU)
+        self.plan_cache_size = plan_cache_size
+        self._plan_cache: OrderedDict[str, CompiledPlan] = OrderedDict()
+        # Optional cap on nodes running at once across all runs; under contention
+        # nodes of higher-priority runs (lower value) are admitted first
+        self._gate = PriorityGate(max_concurrency) if max_concurrency > 0 else None
+        self._http_session: Optional[aiohttp.ClientSession] = None
+        # Plain string keys: NodeType hashes equal to its value, so enum members
+        # and raw strings from deserialized workflows both resolve
         self.node_factories = {
-            NodeType.WEBHOOK: WebhookNode,
-            NodeType.CODE: CodeNode,
-            NodeType.AI_AGENT: lambda config: AIAgentNode(config, self.llm_factory),
-            NodeType.OUTPUT_PASS: OutputPassNode,
+            NodeType.WEBHOOK.value: WebhookNode,
+            NodeType.CODE.value: CodeNode,
+            NodeType.AI_AGENT.value: lambda config: AIAgentNode(config, self.llm_factory, self._executor_cache),
+            NodeType.OUTPUT_PASS.value: OutputPassNode,
+            NodeType.HTTP_REQUEST.value: lambda config: HTTPRequestNode(config, self._get_http_session),
         }
     
+    def _get_http_session(self) -> aiohttp.ClientSession:
+        """Shared outbound HTTP session, created on first use inside the running loop"""
+        if self._http_session is None or self._http_session.closed:
+            self._http_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=100, ttl_dns_cache=300)
+            )
+        return self._http_session
+    
+    def _default_llm(self, model_config: Dict[str, Any]) -> AzureChatOpenAI:
+        """One Azure OpenAI client per (deployment, temperature, max_tokens), all on a shared connection pool"""
+        key = (
+            model_config.get('deployment', 'gpt-4'),
+            model_config.get('temperature', 0.7),
+            model_config.get('max_tokens', 1000)
+        )
+        llm = self._llm_cache.get(key)
+        if llm is None:
+            if self._httpx_client is None:
+                self._httpx_client = httpx.AsyncClient(
+                    limits=httpx.Limits(max_connections=50, max_keepalive_connections=20)
+                )
+            llm = self._llm_cache[key] = _lc().AzureChatOpenAI(
+                azure_deployment=key[0],
+                temperature=key[1],
+                max_tokens=key[2],
+                timeout=30,
+                max_retries=3,
+                http_async_client=self._httpx_client
+            )
+        return llm
+    
+    async def aclose(self):
+        """Release the shared HTTP session and LLM connection pool"""
+        if self._http_session is not None:
+            await self._http_session.close()
+            self._http_session = None
+        if self._httpx_client is not None:
+            await self._httpx_client.aclose()
+            self._httpx_client = None
+            self._llm_cache.clear()
+        # Cached executors reference the LLMs (and the pool) just closed
+        self._executor_cache.clear()
+    
     async def execute_workflow(
         self, 
-        workflow_def: WorkflowDefinition, 
+        workflow_def: Union[WorkflowDefinition, CompiledWorkflow], 
         initial_data: Any = None,
-        session_id: str = None
+        session_id: str = None,
+        priority: Optional[int] = None
     ) -> Dict[str, Any]:
         """Execute a complete workflow"""
+        result = None
+        async for event in self.stream_workflow(workflow_def, initial_data, session_id, priority):
+            if event['event'] == 'workflow_complete':
+                result = event['result']
+        return result
+    
+    async def stream_workflow(
+        self, 
+        workflow_def: Union[WorkflowDefinition, CompiledWorkflow], 
+        initial_data: Any = None,
+        session_id: str = None,
+        priority: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Execute a workflow, yielding node_start/node_output events and a final workflow_complete"""
+        
+        plan = self._get_plan(workflow_def)
+        if priority is None:
+            priority = self._priority_from_input(initial_data)
+        compiled = plan.compiled
         
-        context = WorkflowContext(workflow_def.workflow_id, session_id)
+        context = WorkflowContext(compiled.workflow_id, session_id, self.history_factory)
         context.data['initial_input'] = initial_data
         
-        logger.info(f"Starting workflow execution: {workflow_def.name}")
+        logger.debug("Starting workflow execution: %s", compiled.name)
         
-        # Find entry point (webhook node)
-        entry_nodes = [node for node in workflow_def.nodes if node.node_type == NodeType.WEBHOOK]
-        if not entry_nodes:
-            raise ValueError("Workflow must have a webhook entry point")
+        # Start each node as soon as all of its predecessors have settled, so
+        # independent branches overlap. A node runs if it is the entry point
+        # or at least one predecessor completed; otherwise it is skipped.
+        node_ids = compiled.node_ids
+        dependencies = compiled.dependencies
+        executed = bytearray(len(node_ids))
+        sorter = graphlib.TopologicalSorter(dependencies)
+        sorter.prepare()
+        ready = deque(sorter.get_ready())
+        running: Dict[asyncio.Task, int] = {}
         
-        # Execute nodes in order
-        executed_nodes = set()
-        execution_queue = [entry_nodes[0].node_id]
+        def settle(index: int):
+            sorter.done(index)
+            ready.extend(sorter.get_ready())
         
-        while execution_queue:
-            current_node_id = execution_queue.pop(0)
-            
-            if current_node_id in executed_nodes:
-                continue
-            
-            # Find node definition
-            node_config = next(
-                (node for node in workflow_def.nodes if node.node_id == current_node_id), 
-                None
-            )
-            
-            if not node_config:
-                logger.error(f"Node {current_node_id} not found in workflow")
-                continue
-            
-            # Create and execute node
-            node = self._create_node(node_config)
-            input_data = self._get_node_input(current_node_id, context, workflow_def)
-            
-            logger.info(f"Executing node: {current_node_id} ({node_config.node_type})")
-            
-            result = await node.execute(context, input_data)
-            context.add_execution_result(result)
-            
-            if result.status == NodeStatus.COMPLETED:
-                context.set_node_output(current_node_id, result.output)
-                executed_nodes.add(current_node_id)
+        try:
+            while ready or running:
+                while ready:
+                    index = ready.popleft()
+                    if index != compiled.entry_index and not any(executed[p] for p in dependencies[index]):
+                        settle(index)
+                        continue
+                    
+                    node_id = node_ids[index]
+                    yield {'event': 'node_start', 'node_id': node_id}
+                    running[asyncio.create_task(
+                        self._run_node(plan.nodes[node_id], context, compiled, priority)
+                    )] = index
                 
-                # Add connected nodes to queue
-                next_nodes = self._get_next_nodes(current_node_id, workflow_def)
-                execution_queue.extend(next_nodes)
-            else:
-                logger.error(f"Node {current_node_id} failed: {result.error}")
-                # Handle failure according to workflow settings
+                if not running:
+                    break
+                
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=lambda t: compiled.topo_rank[running[t]]):
+                    index = running.pop(task)
+                    result = task.result()
+                    
+                    context.add_execution_result(result)
+                    if result.status_int == _NodeStatusInt.COMPLETED:
+                        context.set_node_output(result.node_id, result.output)
+                        executed[index] = 1
+                    elif result.status_int == _NodeStatusInt.FAILED:
+                        logger.error(f"Node {result.node_id} failed: {result.error}")
+                        # Handle failure according to workflow settings
+                    
+                    yield {
+                        'event': 'node_output',
+                        'node_id': result.node_id,
+                        'status': result.status.value,
+                        'output': result.output,
+                        'error': result.error,
+                        'execution_time_ms': result.execution_time_ms
+                    }
+                    settle(index)
+        finally:
+            # Abandoned streams and node errors must not leave orphaned tasks
+            for task in running:
+                task.cancel()
         
         # Prepare final response
-        return self._prepare_workflow_response(context, workflow_def)
+        yield {
+            'event': 'workflow_complete',
+            'result': self._prepare_workflow_response(context, compiled.definition)
+        }
+    
+    def _get_plan(self, workflow_def: Union[WorkflowDefinition, CompiledWorkflow]) -> CompiledPlan:
+        """Return the cached plan for a workflow, compiling and instantiating nodes on a miss"""
+        if isinstance(workflow_def, CompiledWorkflow):
+            compiled, fingerprint = workflow_def, workflow_def.fingerprint
+        else:
+            compiled, fingerprint = None, workflow_fingerprint(workflow_def)
+        
+        plan = self._plan_cache.get(fingerprint)
+        if plan is not None:
+            self._plan_cache.move_to_end(fingerprint)
+            return plan
+        
+        compiled = compiled or compile_workflow(workflow_def)
+        plan = CompiledPlan(
+            compiled=compiled,
+            nodes=MappingProxyType({
+                node_id: self._create_node(node_config)
+                for node_id, node_config in compiled.node_by_id.items()
+            })
+        )
+        self._plan_cache[fingerprint] = plan
+        if len(self._plan_cache) > self.plan_cache_size:
+            self._plan_cache.popitem(last=False)
+        return plan
+    
+    @staticmethod
+    def _priority_from_input(initial_data: Any) -> int:
+        """Read an optional metadata.priority from the run input; 0 when absent"""
+        if isinstance(initial_data, dict) and isinstance(initial_data.get('metadata'), dict):
+            try:
+                return int(initial_data['metadata'].get('priority', 0))
+            except (TypeError, ValueError):
+                pass
+        return 0
+    
+    async def _run_node(
+        self, 
+        node: BaseNode, 
+        context: WorkflowContext, 
+        compiled: CompiledWorkflow,
+        priority: int = 0
+    ) -> NodeExecutionResult:
+        """Execute a single node with its input gathered from upstream outputs"""
+        input_data = self._get_node_input(node.node_id, context, compiled)
+        
+        logger.debug("Executing node: %s (%s)", node.node_id, node.node_type)
+        
+        if self._gate is None:
+            return await node.execute(context, input_data)
+        
+        await self._gate.acquire(priority)
+        try:
+            return await node.execute(context, input_data)
+        finally:
+            self._gate.release()
     
     def _create_node(self, config: NodeConfig) -> BaseNode:
         """Create a node instance from configuration"""
@@ -512,17 +930,24 @@ class WorkflowEngine:
         self, 
         node_id: str, 
         context: WorkflowContext, 
-        workflow_def: WorkflowDefinition
+        compiled: CompiledWorkflow
     ) -> Any:
         """Get input data for a node"""
         
-        # Find incoming connections
-        incoming = [conn for conn in workflow_def.connections if conn.target_node == node_id]
+        incoming = compiled.predecessors[node_id]
         
         if not incoming:
             # Entry node - use initial data
             return context.data.get('initial_input')
         
+        if len(incoming) == 1:
+            # Common case: a single upstream node, no dict to build
+            connection = incoming[0]
+            source_output = context.get_node_output(connection.source_node)
+            if connection.output_key and isinstance(source_output, dict):
+                return source_output.get(connection.output_key)
+            return source_output
+        
         # Collect inputs from source nodes
         inputs = {}
         for connection in incoming:
@@ -533,14 +958,9 @@ class WorkflowEngine:
         
         # If single input, return directly; if multiple, return dict
         if len(inputs) == 1:
-            return list(inputs.values())[0]
+            return next(iter(inputs.values()))
         return inputs
     
-    def _get_next_nodes(self, node_id: str, workflow_def: WorkflowDefinition) -> List[str]:
-        """Get next nodes to execute"""
-        outgoing = [conn for conn in workflow_def.connections if conn.source_node == node_id]
-        return [conn.target_node for conn in outgoing]
-    
     def _prepare_workflow_response(
         self, 
         context: WorkflowContext, 
@@ -548,13 +968,13 @@ class WorkflowEngine:
     ) -> Dict[str, Any]:
         """Prepare final workflow response"""
         
-        # Find final output
+        # Find final output from the last node that completed, so a failed
+        # trailing callback doesn't discard the agents' result
         final_output = None
-        if context.node_outputs:
-            # Get output from last executed node
-            last_result = context.execution_history[-1] if context.execution_history else None
-            if last_result and last_result.status == NodeStatus.COMPLETED:
-                final_output = context.get_node_output(last_result.node_id)
+        for result in reversed(context.execution_history):
+            if result.status_int == _NodeStatusInt.COMPLETED:
+                final_output = context.get_node_output(result.node_id)
+                break
         
         # Calculate total execution time
         total_time = sum(result.execution_time_ms for result in context.execution_history)
@@ -563,6 +983,7 @@ class WorkflowEngine:
             'workflow_id': context.workflow_id,
             'session_id': context.session_id,
             'status': 'completed',
+            'immediate_response': context.data.get('immediate_response'),
             'final_output': final_output,
             'execution_history': [
                 {
@@ -574,17 +995,17 @@ class WorkflowEngine:
                 for result in context.execution_history
             ],
             'total_execution_time_ms': total_time,
-            'timestamp': datetime.utcnow().isoformat()
+            'timestamp': datetime.now(timezone.utc).isoformat()
         }
 
 # MAANG-Grade Prompt Engineering Workflow
-def create_prompt_engineering_workflow() -> WorkflowDefinition:
+def _build_prompt_engineering_workflow() -> WorkflowDefinition:
     """Create a workflow for MAANG-grade prompt engineering with 3 specialized agents"""
     
     return WorkflowDefinition(
         workflow_id=str(uuid.uuid4()),
         name="MAANG-Grade Prompt Engineering Workflow",
-        nodes=[
+        nodes=(
             NodeConfig(
                 node_id="webhook_1",
                 node_type=NodeType.WEBHOOK,
@@ -778,14 +1199,14 @@ Output ONLY the final developer-friendly prompt template, nothing else.''',
                 name="HTTP Request",
                 config={
                     'method': 'POST',
-                    'url': 'https://your-webhook-endpoint.com/prompt-engineering-complete',
+                    'url_env': 'WORKFLOW_CALLBACK_URL',
                     'headers': {
                         'Content-Type': 'application/json'
                     }
                 }
             )
-        ],
-        connections=[
+        ),
+        connections=(
             Connection("webhook_1", "code_1"),
             Connection("code_1", "workflow_config_1"),
             Connection("workflow_config_1", "agent_1_prompt_architect"),
@@ -795,17 +1216,17 @@ Output ONLY the final developer-friendly prompt template, nothing else.''',
             Connection("pass_agent2_output", "agent_3_template_polisher"),
             Connection("agent_3_template_polisher", "final_output"),
             Connection("final_output", "http_request_1")
-        ]
+        )
     )
 
 # Keep the original workflow as well for backward compatibility
-def create_n8n_workflow_example() -> WorkflowDefinition:
+def _build_n8n_workflow_example() -> WorkflowDefinition:
     """Create a general workflow that matches your n8n diagram"""
     
     return WorkflowDefinition(
         workflow_id=str(uuid.uuid4()),
         name="General Multi-Agent Workflow",
-        nodes=[
+        nodes=(
             NodeConfig(
                 node_id="webhook_1",
                 node_type=NodeType.WEBHOOK,
@@ -911,14 +1332,14 @@ def create_n8n_workflow_example() -> WorkflowDefinition:
                 name="HTTP Request",
                 config={
                     'method': 'POST',
-                    'url': 'https://your-webhook-endpoint.com/callback',
+                    'url_env': 'WORKFLOW_CALLBACK_URL',
                     'headers': {
                         'Content-Type': 'application/json'
                     }
                 }
             )
-        ],
-        connections=[
+        ),
+        connections=(
             Connection("webhook_1", "code_1"),
             Connection("code_1", "workflow_config_1"),
             Connection("workflow_config_1", "ai_agent_1"),
@@ -926,9 +1347,22 @@ def create_n8n_workflow_example() -> WorkflowDefinition:
             Connection("pass_agent1_output", "ai_agent_2"),
             Connection("ai_agent_2", "pass_agent2_output"),
             Connection("pass_agent2_output", "http_request_1")
-        ]
+        )
     )
 
+# Built-in workflows are built and compiled once at import and shared read-only;
+# their node and connection lists are tuples so callers can't grow them in place
+PROMPT_ENGINEERING_WORKFLOW = compile_workflow(_build_prompt_engineering_workflow())
+N8N_WORKFLOW_EXAMPLE = compile_workflow(_build_n8n_workflow_example())
+
+def create_prompt_engineering_workflow() -> WorkflowDefinition:
+    """Shared prompt engineering workflow definition; do not mutate"""
+    return PROMPT_ENGINEERING_WORKFLOW.definition
+
+def create_n8n_workflow_example() -> WorkflowDefinition:
+    """Shared general workflow definition; do not mutate"""
+    return N8N_WORKFLOW_EXAMPLE.definition
+
 # Example usage
 async def test_prompt_engineering_workflow():
     """Test the prompt engineering workflow with MAANG-grade agents"""
@@ -1008,7 +1442,17 @@ async def test_n8n_workflow():
     )
     
     print("Workflow execution result:")
-    print(json.dumps(result, indent=2, default=str))
+    write_json(result, pretty='--pretty' in sys.argv)
+
+def write_json(obj: Any, pretty: bool = False):
+    """Serialize obj straight to stdout as UTF-8 bytes; indented only when pretty"""
+    option = orjson.OPT_NON_STR_KEYS
+    if pretty:
+        option |= orjson.OPT_INDENT_2
+    sys.stdout.flush()  # Keep ordering with earlier print() output
+    sys.stdout.buffer.write(orjson.dumps(obj, option=option, default=str))
+    sys.stdout.buffer.write(b'\n')
+    sys.stdout.buffer.flush()
 
 if __name__ == "__main__":
     print("🚀 N8N-Style Workflow Engine Test Suite")
@@ -1033,4 +1477,14 @@ if __name__ == "__main__":
         
         print("\n🎯 Test Suite Complete!")
     
-    asyncio.run(run_all_tests())
\ No newline at end of file
+    # uvloop's C event loop when available (not on Windows); stdlib loop otherwise.
+    # Only the script entry point picks the loop - importing the engine never does.
+    try:
+        import uvloop
+    except ImportError:
+        uvloop = None
+    
+    if uvloop:
+        uvloop.run(run_all_tests())
+    else:
+        asyncio.run(run_all_tests())
\ No newline at end of file
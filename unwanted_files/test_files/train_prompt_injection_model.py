@@ -1,80 +1,141 @@
 import os
+import math
 from datasets import load_dataset, Dataset
-import pandas as pd
-from transformers import AutoTokenizer, AutoModelForSequenceClassification, TrainingArguments, Trainer
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from transformers import AutoTokenizer, AutoModelForSequenceClassification, TrainingArguments, Trainer, DataCollatorWithPadding
 import numpy as np
 import torch
-from sklearn.model_selection import train_test_split
 
 # CONFIG
 MODEL_NAME = "distilbert-base-uncased"   # small, fast
 OUT_DIR = "models/prompt_injection_detector"
-BATCH_SIZE = 16
+USE_CUDA = torch.cuda.is_available()
+USE_BF16 = USE_CUDA and torch.cuda.is_bf16_supported()  # Ampere+; no loss scaling needed
+BATCH_SIZE = 32 if USE_BF16 else 16  # bf16 halves activation memory vs fp32
 EPOCHS = 2
+DATALOADER_WORKERS = min(8, (os.cpu_count() or 2) // 2)
 MAX_LENGTH = 256
 SEED = 42
+FREEZE_LAYERS = 3  # Bottom DistilBERT blocks (of 6) kept frozen along with the embeddings
+
+# Let matmuls/convolutions use TF32 tensor cores on Ampere+ (no-op elsewhere)
+torch.backends.cuda.matmul.allow_tf32 = True
+torch.backends.cudnn.allow_tf32 = True
 
 # If your parquet is local
-# df = pd.read_parquet("data/train-00000-of-00001-9564e8b05b4757ab.parquet")
+# table = pq.read_table("data/train-00000-of-00001-9564e8b05b4757ab.parquet")
 # If you want to read HF dataset directly (alternative)
 # ds = load_dataset("deepset/prompt-injections", split="train")  # if available
 
-# Example: load parquet with pandas (replace path as needed)
-df = pd.read_parquet("data/train-00000-of-00001-9564e8b05b4757ab.parquet")
+# Example: load parquet straight into Arrow (replace path as needed)
+DATA_PATH = "data/train-00000-of-00001-9564e8b05b4757ab.parquet"
 
 # Inspect expected columns: you need a text column and a label column.
 # Adjust these names to match your dataset (e.g., 'prompt', 'label' or 'score')
-print(df.columns)
-# Example: assume df has 'prompt' and 'label' where label is 0/1 or 0..100
+print(pq.read_schema(DATA_PATH).names)
+# Example: assume the file has 'text' and 'label' where label is 0/1 or 0..100
 text_col = "text"
 label_col = "label"   # change if different
 
+# Only the two needed columns are read, and they stay columnar: no pandas copies
+table = pq.read_table(DATA_PATH, columns=[text_col, label_col])
+
 # If labels are continuous 0..100 and you want to train regression:
-is_regression = df[label_col].dtype.kind in "fi" and df[label_col].max() > 1
+label_type = table.schema.field(label_col).type
+is_regression = (pa.types.is_integer(label_type) or pa.types.is_floating(label_type)) and pc.max(table[label_col]).as_py() > 1
 
-# For binary classification convert label > threshold to 1/0 if needed:
+# Split in Arrow (labels are cast to int in preprocess for classification).
+# Classification splits keep the class balance; eval is capped at ~2000 examples
+ds = Dataset(table)
+stratify_col = None
 if not is_regression:
-    # Ensure labels are 0/1
-    df[label_col] = df[label_col].astype(int)
-
-# Split
-train_df, val_df = train_test_split(df[[text_col, label_col]], test_size=0.1, random_state=SEED, shuffle=True, stratify=None)
-
-# Convert to HF datasets
-train_ds = Dataset.from_pandas(train_df.reset_index(drop=True))
-val_ds = Dataset.from_pandas(val_df.reset_index(drop=True))
+    ds = ds.class_encode_column(label_col)
+    stratify_col = label_col
+splits = ds.train_test_split(
+    test_size=min(0.1, 2000 / len(ds)), seed=SEED, shuffle=True, stratify_by_column=stratify_col
+)
+train_ds, val_ds = splits["train"], splits["test"]
 
 tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME, use_fast=True)
 
 def preprocess(batch):
-    tokens = tokenizer(batch[text_col], truncation=True, padding='max_length', max_length=MAX_LENGTH)
+    # No padding here; the collator pads each batch to its longest example
+    tokens = tokenizer(batch[text_col], truncation=True, max_length=MAX_LENGTH)
     if is_regression:
         tokens["labels"] = [float(x) for x in batch[label_col]]
     else:
         tokens["labels"] = [int(x) for x in batch[label_col]]
     return tokens
 
-train_ds = train_ds.map(preprocess, batched=True, remove_columns=train_ds.column_names)
-val_ds = val_ds.map(preprocess, batched=True, remove_columns=val_ds.column_names)
+# Tokenized splits are cached on disk, keyed by everything that changes their contents,
+# so warm runs load Arrow files instead of re-running the tokenizer
+CACHE_DIR = "data/.cache"
+os.makedirs(CACHE_DIR, exist_ok=True)
+data_stat = os.stat(DATA_PATH)
+cache_key = f"{MODEL_NAME.replace('/', '_')}-{MAX_LENGTH}-{SEED}-{data_stat.st_size}-{int(data_stat.st_mtime)}"
+
+def tokenize(ds, split):
+    return ds.map(
+        preprocess,
+        batched=True,
+        batch_size=1000,
+        num_proc=os.cpu_count(),
+        remove_columns=ds.column_names,
+        load_from_cache_file=True,
+        cache_file_name=os.path.join(CACHE_DIR, f"{split}_tok-{cache_key}.arrow"),
+    )
+
+train_ds = tokenize(train_ds, "train")
+val_ds = tokenize(val_ds, "val")
 
 if is_regression:
     model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME, problem_type="regression", num_labels=1)
 else:
-    num_labels = int(df[label_col].nunique())
+    num_labels = len(pc.unique(table[label_col]))
     model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME, num_labels=num_labels)
 
+# Only fine-tune the top blocks and the head: the frozen bottom skips backward
+# compute and optimizer state, and small datasets rarely need to move it
+frozen_prefixes = ("distilbert.embeddings.",) + tuple(
+    f"distilbert.transformer.layer.{i}." for i in range(FREEZE_LAYERS)
+)
+for name, param in model.named_parameters():
+    if name.startswith(frozen_prefixes):
+        param.requires_grad = False
+
+# Evaluate/checkpoint every 500 steps on big sets, but at least once per epoch on small
+# ones (the bundled parquet is ~60 steps in total), so load_best_model_at_end has checkpoints
+steps_per_epoch = math.ceil(len(train_ds) / (BATCH_SIZE * max(1, torch.cuda.device_count())))
+EVAL_STEPS = min(500, steps_per_epoch)
+
 training_args = TrainingArguments(
     output_dir=OUT_DIR,
-    eval_strategy="epoch",
-    save_strategy="epoch",
+    eval_strategy="steps",
+    eval_steps=EVAL_STEPS,
+    eval_accumulation_steps=8,  # move eval logits off-device in chunks
+    save_strategy="steps",  # must match eval_strategy for load_best_model_at_end
+    save_steps=EVAL_STEPS,
     per_device_train_batch_size=BATCH_SIZE,
     per_device_eval_batch_size=BATCH_SIZE,
     num_train_epochs=EPOCHS,
-    logging_steps=100,
+    logging_steps=min(100, EVAL_STEPS),
     save_total_limit=2,
     load_best_model_at_end=True,
     metric_for_best_model="eval_loss",
-    fp16=torch.cuda.is_available(),
+    bf16=USE_BF16,
+    fp16=USE_CUDA and not USE_BF16,
+    # Fused kernels only pay off (and the fused optimizer only works) on GPU
+    torch_compile=USE_CUDA,
+    torch_compile_backend="inductor",
+    optim="adamw_torch_fused" if USE_CUDA else "adamw_torch",
+    gradient_checkpointing=False,
+    # Collate and copy the next batches in background workers while the GPU runs
+    dataloader_num_workers=DATALOADER_WORKERS,
+    dataloader_pin_memory=USE_CUDA,
+    dataloader_persistent_workers=DATALOADER_WORKERS > 0,
+    dataloader_prefetch_factor=2 if DATALOADER_WORKERS > 0 else None,
 )
 
 # Simple metric function: MSE for regression, accuracy for classification
@@ -101,9 +162,36 @@ trainer = Trainer(
     eval_dataset=val_ds,
     compute_metrics=compute_metrics,
     tokenizer=tokenizer,
+    data_collator=DataCollatorWithPadding(tokenizer, pad_to_multiple_of=8),  # multiples of 8 suit fp16 tensor cores
 )
 
 trainer.train()
 trainer.save_model(OUT_DIR)
 tokenizer.save_pretrained(OUT_DIR)
-print("Saved model to", OUT_DIR)
\ No newline at end of file
+print("Saved model to", OUT_DIR)
+
+# Export an ONNX copy for CPU serving. INT8 dynamic quantization only pays off with
+# AVX512-VNNI int8 dot products; without them quantized matmuls can be slower, so keep fp32
+try:
+    from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+except ImportError:
+    print("optimum[onnxruntime] not installed; skipping ONNX export")
+else:
+    ONNX_DIR = os.path.join(OUT_DIR, "onnx")
+    ort_model = ORTModelForSequenceClassification.from_pretrained(OUT_DIR, export=True)
+    ort_model.save_pretrained(ONNX_DIR)
+    tokenizer.save_pretrained(ONNX_DIR)
+    
+    try:
+        import cpuinfo
+        cpu_flags = set(cpuinfo.get_cpu_info().get("flags", []))
+    except ImportError:
+        cpu_flags = set()
+    
+    if "avx512_vnni" in cpu_flags:
+        qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=True)
+        ORTQuantizer.from_pretrained(ort_model).quantize(save_dir=ONNX_DIR, quantization_config=qconfig)
+        print("Saved ONNX + INT8 (AVX512-VNNI) model to", ONNX_DIR)
+    else:
+        print("Saved fp32 ONNX model to", ONNX_DIR, "(no AVX512-VNNI, skipped INT8)")
\ No newline at end of file